@@ -12,6 +12,8 @@ from discord.ext import commands
 from discord.utils import utcnow
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import Any, Optional
+from utils.fetcher import SheetFetcher
+from utils.searchExecutor import SearchExecutor
 from utils.models import CommandExecutableGuildChannel, WebhookMessagableChannel
 
 import asyncio
@@ -80,6 +82,13 @@ class Al9oo(commands.AutoShardedBot):
     async def setup_hook(self) -> None:        
         self.load_mongo_drivers()
         self.session = ClientSession()
+        self.fetcher = SheetFetcher()
+        self.search_executor = SearchExecutor(
+            mode=search_executor_mode,
+            max_workers=search_workers,
+            max_pending=search_max_pending,
+            inline_threshold=search_inline_threshold,
+        )
         self.bot_app_info = await self.application_info()     
         self.owner_id = self.bot_app_info.owner.id
         
@@ -140,6 +149,8 @@ class Al9oo(commands.AutoShardedBot):
             self.logger.info("Closing MongoDB connection")
             self.pool.close()
             await self.session.close()
+            await self.fetcher.close()
+            self.search_executor.shutdown()
         except Exception as e:
             self.logger.critical(f"Error during database disconnection: {e}")
         
@@ -0,0 +1,96 @@
+"""Allocation benchmark of answering autocompletes, with and without `AutocompleteTable`.
+
+Run from the repository root:
+
+    python -m benchmarks.autocomplete_alloc [--sizes 1000 10000 100000] [--queries 200]
+
+Peak traced memory of one answer is measured with tracemalloc,
+for empty queries and for typed queries (search included).
+"""
+from __future__ import annotations
+from discord import app_commands
+from utils import fuzzy
+from utils.autocomplete import AutocompleteTable
+from utils.store import ReferenceStore
+from .corpus import make_queries, make_references
+
+import argparse
+import gc
+import statistics
+import tracemalloc
+
+
+options = {'limit' : 25, 'prefilter' : True, 'min_candidates' : 0}
+
+
+def choices_before(store : ReferenceStore, current : str) -> list[app_commands.Choice[str]]:
+    # how autocompletes answered before the table
+    if not current:
+        result = [a.car for a in store]
+    else:
+        result = fuzzy.extract_group(current, 'car', store)
+
+    return [
+        app_commands.Choice(name=choice, value=choice) for choice in result
+        if current.lower().replace(" ", "") in choice.lower().replace(" ", "")
+    ][:25]
+
+
+def choices_with_table(table : AutocompleteTable, store : ReferenceStore, current : str) -> list[app_commands.Choice[str]]:
+    if not current:
+        return table.choose(current, ())
+    matches = fuzzy.extract_group(current, 'car', store, raw=True, **options)
+    return table.choose(current, [position for _, _, position in matches])
+
+
+def peak(func, *args) -> int:
+    fuzzy.query_cache.clear()
+    gc.collect()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    func(*args)
+    return tracemalloc.get_traced_memory()[1] - before
+
+
+def measure(size : int, count : int) -> dict[str, float]:
+    store = ReferenceStore.from_references('bench', make_references(size))
+    table = AutocompleteTable(store.index('car'))
+    queries = make_queries(store.unique('car'), count)
+
+    tracemalloc.start()
+    try:
+        result = {
+            'empty before' : peak(choices_before, store, ''),
+            'empty table' : peak(choices_with_table, table, store, ''),
+            'typed before' : statistics.median(peak(choices_before, store, q) for q in queries),
+            'typed table' : statistics.median(peak(choices_with_table, table, store, q) for q in queries),
+        }
+    finally:
+        tracemalloc.stop()
+
+    for query in queries:
+        fuzzy.query_cache.clear()
+        before = [(c.name, c.value) for c in choices_before(store, query)]
+        fuzzy.query_cache.clear()
+        after = [(c.name, c.value) for c in choices_with_table(table, store, query)]
+        assert before == after, query
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'empty before':>14} {'empty table':>13} {'typed before':>14} {'typed table':>13}  (peak KiB, typed = median)")
+    for size in args.sizes:
+        result = measure(size, args.queries)
+        print(
+            f"{size:>8} {result['empty before'] / 1024:>14.1f} {result['empty table'] / 1024:>13.1f}"
+            f" {result['typed before'] / 1024:>14.1f} {result['typed table'] / 1024:>13.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Synthetic reference corpora used by benchmarks."""
+from __future__ import annotations
+from utils.models import ReferenceInfo
+
+import random
+
+
+classes = ('S', 'A', 'B', 'C', 'D')
+
+makers = (
+    'Bugatti', 'Ferrari', 'Lamborghini', 'Porsche', 'McLaren', 'Koenigsegg',
+    'Pagani', 'Aston Martin', 'Mercedes-AMG', 'Chevrolet', 'Ford', 'Nissan',
+)
+models = (
+    'Chiron', 'Divo', 'SF90 Stradale', 'Aventador SVJ', '911 GT3 RS', 'Senna',
+    'Jesko', 'Huayra R', 'Valkyrie', 'One', 'Corvette C8.R', 'GT', 'GT-R Nismo',
+)
+places = (
+    'San Francisco', 'Rome', 'Cairo', 'Shanghai', 'Scotland', 'Himalayas',
+    'Buenos Aires', 'Greek Islands', 'Singapore', 'U.S. Midwest', 'Osaka',
+)
+routes = ('Downhill', 'Rush Hour', 'Loop', 'Bridge', 'Harbor', 'Temple', 'Canyon')
+
+
+def _copy(value : str) -> str:
+    # a new string object, like the ones csv.reader returns.
+    return ''.join(value)
+
+
+def car_name(rng : random.Random, index : int) -> str:
+    name = f'{rng.choice(makers)} {rng.choice(models)}'
+    if index % 7 == 0:
+        name += ' (OC)'
+    elif index % 11 == 0:
+        name += f' {rng.randint(2, 9)}'
+    return name
+
+
+def track_name(rng : random.Random) -> str:
+    return f'{rng.choice(places)} - {rng.choice(routes)}'
+
+
+def make_references(size : int, *, seed : int = 0) -> list[ReferenceInfo]:
+    """Builds `size` references like the ones parsed from sheets.
+    Every string is a new object, as if it came from csv.reader."""
+    rng = random.Random(seed)
+    cars = [car_name(rng, i) for i in range(max(size // 8, 1))]
+    tracks = [track_name(rng) for _ in range(max(size // 40, 1))]
+
+    return [
+        ReferenceInfo(
+            cls=_copy(rng.choice(classes)),
+            car=_copy(rng.choice(cars)),
+            track=_copy(rng.choice(tracks)),
+            record=f'{rng.randint(0, 2)}:{rng.randint(0, 59):02}.{rng.randint(0, 999):03}',
+            link=f'https://youtu.be/{rng.getrandbits(40):010x}',
+        )
+        for _ in range(size)
+    ]
+
+
+def make_queries(values : list[str], count : int, *, seed : int = 0) -> list[str]:
+    """Builds queries users type: prefixes, typos, OC variants and exact picks."""
+    rng = random.Random(seed)
+    queries = []
+
+    for _ in range(count):
+        value = rng.choice(values)
+        kind = rng.random()
+
+        if kind < 0.35:
+            query = value
+        elif kind < 0.65:
+            query = value[:rng.randint(1, len(value))]
+        elif kind < 0.85:
+            position = rng.randrange(len(value))
+            query = value[:position] + value[position + 1:]
+        else:
+            query = ' '.join(rng.sample(value.split(), k=len(value.split())))
+
+        if rng.random() < 0.15:
+            query += rng.choice((' oc', ' (OC)', ' OC'))
+        if rng.random() < 0.5:
+            query = query.lower()
+        queries.append(query)
+    return queries
@@ -0,0 +1,160 @@
+"""Latency and throughput benchmark of `utils.fuzzy` searches.
+
+Run from the repository root:
+
+    python -m benchmarks.fuzzy_search [--sizes 1000 10000 100000] [--queries 500]
+                                      [--json results.json] [--compare baseline.json]
+
+Query mixes are prefixes, typos, reordered words, OC variants and exact picks
+(see `corpus.make_queries`). Search cache is cleared before every call unless
+`--cached` is given, so numbers are of cold searches.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Optional
+from utils import fuzzy
+from utils.store import ReferenceStore
+from .corpus import classes, make_queries, make_references
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+
+import numpy as np
+import rapidfuzz
+
+
+Operation = Callable[[ReferenceStore, Any], Any]
+
+
+def _autocomplete(store : ReferenceStore, query : str) -> list[str]:
+    return fuzzy.extract_group(query, 'car', store, limit=25, prefilter=True, min_candidates=0)
+
+
+operations : dict[str, tuple[str, Operation]] = {
+    'extract_group[car]' : ('car', lambda store, query: fuzzy.extract_group(query, 'car', store)),
+    'extract_group[track]' : ('track', lambda store, query: fuzzy.extract_group(query, 'track', store)),
+    'autocomplete[car]' : ('car', _autocomplete),
+    'find[track]' : ('track', lambda store, query: fuzzy.find(query, 'track', store)),
+    'find_one[car]' : ('car', lambda store, query: fuzzy.find_one(query, 'car', store)),
+    'search_references[track+cls]' : ('track+cls', lambda store, query: fuzzy.search_references(query, store)),
+}
+
+
+def _queries(store : ReferenceStore, field : str, count : int, seed : int) -> list[Any]:
+    if field != 'track+cls':
+        return make_queries(store.unique(field), count, seed=seed)
+
+    rng = random.Random(seed)
+    tracks = make_queries(store.unique('track'), count, seed=seed)
+    return [{'track' : track, 'cls' : rng.choice(classes)} for track in tracks]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(store : ReferenceStore, operation : Operation, queries : list[Any], *, cached : bool) -> dict[str, float]:
+    latencies = []
+    failures = 0
+
+    for query in queries:
+        if not cached:
+            fuzzy.query_cache.clear()
+
+        started = time.perf_counter()
+        try:
+            operation(store, query)
+        except (RuntimeError, ValueError):
+            # no match is a valid outcome of a search
+            failures += 1
+        latencies.append(time.perf_counter() - started)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'queries' : len(queries),
+        'failures' : failures,
+        'throughput' : len(queries) / (latencies.sum() / 1000),
+        'mean_ms' : float(latencies.mean()),
+        'p50_ms' : float(np.percentile(latencies, 50)),
+        'p95_ms' : float(np.percentile(latencies, 95)),
+        'p99_ms' : float(np.percentile(latencies, 99)),
+    }
+
+
+def benchmark(sizes : list[int], count : int, *, seed : int, cached : bool) -> dict[str, Any]:
+    results = {}
+    for size in sizes:
+        store = ReferenceStore.from_references('bench', make_references(size, seed=seed))
+        for field in ('car', 'track', 'cls'):
+            store.index(field)
+
+        results[str(size)] = {
+            name : run(store, operation, _queries(store, field, count, seed), cached=cached)
+            for name, (field, operation) in operations.items()
+        }
+
+    return {
+        'revision' : _git_revision(),
+        'python' : platform.python_version(),
+        'rapidfuzz' : rapidfuzz.__version__,
+        'numpy' : np.__version__,
+        'queries' : count,
+        'seed' : seed,
+        'cached' : cached,
+        'results' : results,
+    }
+
+
+def report(data : dict[str, Any], baseline : Optional[dict[str, Any]] = None) -> None:
+    print(f"revision {data['revision']}, {data['queries']} queries per operation, cached={data['cached']}")
+    header = f"{'rows':>7} {'operation':<30} {'q/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    if baseline:
+        header += f" {'p50 vs base':>12}"
+    print(header)
+
+    for size, operations in data['results'].items():
+        for name, result in operations.items():
+            line = (
+                f"{size:>7} {name:<30} {result['throughput']:>9.1f} "
+                f"{result['p50_ms']:>8.3f} {result['p95_ms']:>8.3f} {result['p99_ms']:>8.3f}"
+            )
+            base = (baseline or {}).get('results', {}).get(size, {}).get(name)
+            if base:
+                line += f" {base['p50_ms'] / result['p50_ms']:>11.2f}x"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cached', action='store_true', help='keep search cache between calls')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='results file of a previous run to compare with')
+    args = parser.parse_args()
+
+    data = benchmark(args.sizes, args.queries, seed=args.seed, cached=args.cached)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(data, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Page turn benchmark of `T_Pagination`, with embeds built ahead and with a lazy page source.
+
+Run from the repository root:
+
+    python -m benchmarks.pagination [--pages 10 100 1000] [--turns 200]
+
+For each page count it measures building the view and its first page,
+one page turn (next, and jumps to last and first page), and peak traced
+memory held by the view.
+"""
+from __future__ import annotations
+from collections import deque
+from discord import Embed
+from discord.ext import menus
+from utils.paginator import T_Pagination
+
+import argparse
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+
+
+lines_per_page = 10
+
+
+class LineSource(menus.ListPageSource):
+    def __init__(self, lines : list[str]):
+        super().__init__(lines, per_page=lines_per_page)
+
+    async def format_page(self, menu : T_Pagination, page : list[str]) -> Embed:
+        return Embed(title='Lines', description='\n'.join(page))
+
+
+class _Response:
+    async def edit_message(self, **kwargs):
+        pass
+
+
+class _Interaction:
+    response = _Response()
+
+
+def make_lines(pages : int) -> list[str]:
+    return [f'{i:>6} : {"reference " * 5}' for i in range(pages * lines_per_page)]
+
+
+def build_embeds(lines : list[str]) -> list[Embed]:
+    return [
+        Embed(title='Lines', description='\n'.join(lines[start:start + lines_per_page]))
+        for start in range(0, len(lines), lines_per_page)
+    ]
+
+
+def turn_before(queue : deque[Embed], current : int, total : int) -> Embed:
+    # what a click cost before: rotating the deque and setting footer of every embed
+    queue.rotate(-1)
+    for embed in queue:
+        embed.set_footer(text=f"Page : {current} / {total} ")
+    return queue[0]
+
+
+async def measure(pages : int, turns : int) -> dict[str, float]:
+    lines = make_lines(pages)
+    interaction = _Interaction()
+    result = {}
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    embeds = build_embeds(lines)
+    queue = deque(embeds)
+    queue[0].set_footer(text=f'Page : 1 / {pages}')
+    result['build before'] = time.perf_counter() - started
+    result['memory before'] = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    latencies = []
+    for turn in range(turns):
+        started = time.perf_counter()
+        turn_before(queue, turn % pages + 1, pages)
+        latencies.append(time.perf_counter() - started)
+    result['turn before'] = statistics.median(latencies)
+    del embeds, queue
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    view = T_Pagination(source=LineSource(lines))
+    await view.render_page(1)
+    result['build lazy'] = time.perf_counter() - started
+    result['memory lazy'] = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    latencies = []
+    for turn in range(turns):
+        started = time.perf_counter()
+        if view._current_page == pages:
+            await view.show_page(interaction, 1)
+        else:
+            await view.show_page(interaction, view._current_page + 1)
+        latencies.append(time.perf_counter() - started)
+    result['turn lazy'] = statistics.median(latencies)
+
+    latencies = []
+    for turn in range(turns):
+        started = time.perf_counter()
+        await view.show_page(interaction, pages if turn % 2 else 1)
+        latencies.append(time.perf_counter() - started)
+    result['jump lazy'] = statistics.median(latencies)
+    view.stop()
+    return result
+
+
+async def run(page_counts : list[int], turns : int):
+    print(
+        f"{'pages':>6} {'build before':>13} {'build lazy':>11} {'turn before':>12} {'turn lazy':>10}"
+        f" {'jump lazy':>10} {'KiB before':>11} {'KiB lazy':>9}  (ms, turn = median)"
+    )
+    for pages in page_counts:
+        result = await measure(pages, turns)
+        print(
+            f"{pages:>6} {result['build before'] * 1000:>13.3f} {result['build lazy'] * 1000:>11.3f}"
+            f" {result['turn before'] * 1000:>12.3f} {result['turn lazy'] * 1000:>10.3f}"
+            f" {result['jump lazy'] * 1000:>10.3f}"
+            f" {result['memory before'] / 1024:>11.1f} {result['memory lazy'] / 1024:>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--turns', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.pages, args.turns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Checks that vectorised scoring ranks exactly like `_oc_scorer`.
+
+Run from the repository root:
+
+    python -m benchmarks.scorer_parity [--size 5000] [--queries 2000]
+
+Top-k extraction (`limit`) is also checked against the full ranking truncated
+to k, for k around multiples of `fuzzy.top_k_chunk` and on values made to tie.
+Exits with status 1 when any ranking differs.
+"""
+from __future__ import annotations
+from rapidfuzz import process
+from utils import fuzzy
+from utils.searchIndex import SearchIndex
+from utils.store import ReferenceStore
+from .corpus import make_queries, make_references
+
+import argparse
+import random
+import sys
+
+
+def reference_extract(query : str, index : SearchIndex, score_cutoff : float):
+    kw = {'car' : True} if index.field == 'car' else None
+    return process.extract(
+        query,
+        index.values,
+        scorer=fuzzy._oc_scorer,
+        score_cutoff=score_cutoff,
+        processor=lambda s: s.lower(),
+        limit=None,
+        scorer_kwargs=kw
+    )
+
+
+def check(size : int, count : int, seed : int) -> int:
+    store = ReferenceStore.from_references('parity', make_references(size, seed=seed))
+    mismatches = 0
+
+    for field in ('car', 'track', 'cls'):
+        index = store.index(field)
+        for query in make_queries(index.values, count, seed=seed):
+            for score_cutoff in (0.0, 30.0):
+                expected = reference_extract(query, index, score_cutoff)
+                actual = fuzzy._extract_indexed(query, index, scorer=None, score_cutoff=score_cutoff, scorer_kwargs=None)
+                if expected != actual:
+                    mismatches += 1
+                    print(f'[{field}] {query!r} (cutoff {score_cutoff})\n  expected {expected[:3]}\n  actual   {actual[:3]}')
+    return mismatches
+
+
+def top_k_limits() -> list[int]:
+    chunk = fuzzy.top_k_chunk
+    return [1, 5, 25, chunk - 1, chunk, chunk + 1, 2 * chunk + 3, 3 * chunk]
+
+
+def tie_index(size : int, seed : int) -> SearchIndex:
+    # many values of the same shape, so most queries score several of them equally
+    rng = random.Random(seed)
+    makers = ('Porsche', 'Ferrari', 'Bugatti', 'Nissan')
+    values = [f'{rng.choice(makers)} GT {i:05d}' for i in range(size)]
+    return SearchIndex.from_choices('car', [{'car' : value} for value in values], name='ties')
+
+
+def check_top_k(indexes : list[SearchIndex], count : int, seed : int) -> tuple[int, int]:
+    """Returns the number of mismatched and of checked top-k rankings."""
+    mismatches = checked = 0
+    for index in indexes:
+        if len(index) <= fuzzy.top_k_chunk:
+            continue
+
+        queries = make_queries(index.values, count, seed=seed)
+        for query in queries:
+            for score_cutoff in (0.0, 60.0):
+                fuzzy.query_cache.clear()
+                full = fuzzy.extract_group(query, index.field, index, raw=True, score_cutoff=score_cutoff)
+                for limit in top_k_limits():
+                    fuzzy.query_cache.clear()
+                    actual = fuzzy.extract_group(query, index.field, index, raw=True, score_cutoff=score_cutoff, limit=limit)
+                    checked += 1
+                    if actual != full[:limit]:
+                        mismatches += 1
+                        print(
+                            f'[{index.name}.{index.field}] {query!r} (cutoff {score_cutoff}, limit {limit})\n'
+                            f'  expected {full[:limit][-3:]}\n  actual   {actual[-3:]}'
+                        )
+    return mismatches, checked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=5_000)
+    parser.add_argument('--queries', type=int, default=2_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mismatches = check(args.size, args.queries, args.seed)
+    print(f'{mismatches} mismatch(es) in {args.queries * 3 * 2} rankings.')
+
+    store = ReferenceStore.from_references('parity', make_references(args.size, seed=args.seed))
+    indexes = [store.index('car'), store.index('track'), tie_index(args.size, args.seed)]
+    top_k_mismatches, checked = check_top_k(indexes, max(args.queries // 10, 1), args.seed)
+    print(f'{top_k_mismatches} mismatch(es) in {checked} top-k rankings.')
+
+    sys.exit(1 if mismatches or top_k_mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Memory and distinct-value scan benchmark of `ReferenceStore` against `list[ReferenceInfo]`.
+
+Run from the repository root:
+
+    python -m benchmarks.store_memory [--sizes 1000 10000 100000]
+"""
+from __future__ import annotations
+from utils.store import ReferenceStore
+from .corpus import make_references
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+
+def measure_memory(size : int) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    references = make_references(size)
+    as_list = tracemalloc.get_traced_memory()[0]
+
+    store = ReferenceStore.from_references('bench', references)
+    del references
+    gc.collect()
+    as_store = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del store
+    return as_list, as_store
+
+
+def measure_scan(size : int, field : str = 'car') -> tuple[float, float]:
+    references = make_references(size)
+    store = ReferenceStore.from_references('bench', references)
+
+    started = time.perf_counter()
+    list_values = {getattr(reference, field) for reference in references}
+    list_scan = time.perf_counter() - started
+
+    started = time.perf_counter()
+    store_values = set(store.unique(field))
+    store_scan = time.perf_counter() - started
+
+    assert list_values == store_values
+    return list_scan, store_scan
+
+
+def measure(size : int) -> dict[str, float]:
+    as_list, as_store = measure_memory(size)
+    list_scan, store_scan = measure_scan(size)
+    return {
+        'rows' : size,
+        'list_bytes' : as_list,
+        'store_bytes' : as_store,
+        'ratio' : as_store / as_list,
+        'list_scan_ms' : list_scan * 1000,
+        'store_scan_ms' : store_scan * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f'{"rows":>8} | {"list":>12} | {"store":>12} | {"ratio":>6} | {"list scan":>10} | {"store scan":>10}')
+    for size in args.sizes:
+        r = measure(size)
+        print(
+            f'{r["rows"]:>8} | {r["list_bytes"]:>10,} B | {r["store_bytes"]:>10,} B | {r["ratio"]:>6.2f} '
+            f'| {r["list_scan_ms"]:>7.2f} ms | {r["store_scan_ms"]:>7.2f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
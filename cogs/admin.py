@@ -7,7 +7,10 @@ from discord import (
 )
 from discord.ext import commands
 from typing import Any, Dict, Literal, Optional, TYPE_CHECKING
+from utils import fuzzy
+from utils.check import is_me
 from utils.embed_color import al9oo_point
+from utils.explain import SearchExplain
 from utils.paginator import T_Pagination
 
 if TYPE_CHECKING:
@@ -89,6 +92,37 @@ class Admin(commands.Cog):
         synced = await self.app.tree.sync(guild=interaction.guild)  
         await interaction.followup.send(f"{len(synced)} command synced here")
 
+    @app_commands.command(name='explain-search', description='...')
+    @app_commands.describe(mode='select', field='select', query='search', cls='narrow down by class')
+    @app_commands.rename(cls='class')
+    @app_commands.guild_only()
+    @is_me()
+    async def explain_search(
+        self,
+        interaction : Interaction,
+        mode : Literal["carhunt", "elite", "gauntlet", "weekly"],
+        field : Literal["car", "track"],
+        query : str,
+        cls : Optional[Literal["S", "A", "B", "C", "D"]] = None,
+    ):
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        references = self.app.get_cog('Reference').snapshot.get(mode)
+        if references is None:
+            await interaction.followup.send(f"References of {mode} are not loaded.", ephemeral=True)
+            return
+
+        fields = {field : query}
+        if cls is not None:
+            fields['cls'] = cls
+
+        explained = SearchExplain()
+        try:
+            fuzzy.search_references(fields, references, explain=explained)
+        except (RuntimeError, ValueError) as e:
+            explained.error = str(e)
+
+        await interaction.followup.send(f"```\n{explained.render()[:1900]}\n```", ephemeral=True)
+
 
 async def setup(app : Al9oo):
     await app.add_cog(Admin(app), guild=Object(id=1205958300873527466))
\ No newline at end of file
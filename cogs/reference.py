@@ -1,23 +1,32 @@
 from __future__ import annotations
-from datetime import time, timezone
+from config import autocomplete_debounce, search_explain_sample_rate
+from datetime import datetime, time, timezone
 
 from discord import app_commands, Interaction, Embed
 from discord.ext import commands, tasks
 from discord.utils import format_dt, utcnow, _human_join
-from typing import Any, List, Literal, TYPE_CHECKING
+from typing import Any, List, Literal, Optional, TYPE_CHECKING
 from utils import (
+    autocomplete,
     embed_color,
+    exception,
+    explain,
     fuzzy,
     models,
     paginator,
     referenceManager,
-    stringformat
+    renderCache,
+    searchIndex,
+    snapshot,
+    store,
 )
 
 if TYPE_CHECKING:
     from al9oo import Al9oo
 
 import asyncio
+import collections
+import random
 
 
 class Reference(commands.Cog):
@@ -25,17 +34,36 @@ class Reference(commands.Cog):
         time(hour=h, minute=m, second=5, tzinfo=timezone.utc) 
         for m in [5, 20, 35, 50] for h in range(24)
     ]
+    # options of autocomplete searches. cache warming uses the same, so they hit the cache.
+    autocomplete_options = {'limit' : 25, 'prefilter' : True, 'min_candidates' : 0}
+    autocomplete_fields = {'carhunt' : 'car', 'gauntlet' : 'track', 'weekly' : 'track'}
     
     def __init__(self, app : Al9oo) -> None:
         self.app = app
+        self.reference_managers = referenceManager.get_references(self.fetcher)
+        self.car_list_manager = referenceManager.get_car_list(self.fetcher)
+        self.renew_status : dict[str, referenceManager.RenewStatus] = {}
+        # replaced as a whole, never mutated. read it once per use for a consistent view.
+        self.snapshot = store.ReferenceSnapshot.empty()
+        self.autocomplete = autocomplete.AutocompleteDispatcher(debounce=autocomplete_debounce)
+        self.candidate_memory = autocomplete.CandidateMemory()
+        self.autocomplete_tables : dict[str, autocomplete.AutocompleteTable] = {}
 
         if not self.app.is_dev:
             self.auto_renew_references.start()
             self.get_car_list.start()
     
     async def cog_load(self) -> None:
-        await self.renew_references()
-        await self.renew_car_list()
+        stored = await asyncio.to_thread(snapshot.load_snapshot)
+
+        if stored is None:
+            await self.renew_references(prepare=False)
+            await self.renew_car_list(prepare=False)
+            await self.prepare_searches()
+            return
+
+        await self.apply_stored_snapshot(stored)
+        self.initial_renew.start()
 
     @property
     def logger(self):
@@ -44,6 +72,14 @@ class Reference(commands.Cog):
     @property
     def session(self):
         return self.app.session
+
+    @property
+    def fetcher(self):
+        return self.app.fetcher
+
+    @property
+    def search_executor(self):
+        return self.app.search_executor
     
     @tasks.loop(time=renew_time)
     async def auto_renew_references(self) -> None:
@@ -53,50 +89,268 @@ class Reference(commands.Cog):
     async def get_car_list(self):
         await self.renew_car_list()
 
+    @tasks.loop(count=1)
+    async def initial_renew(self):
+        await self.prepare_searches()
+        renewed = await self.renew_references(prepare=False)
+        renewed |= await self.renew_car_list(prepare=False)
+        if renewed:
+            await self.prepare_searches()
+
     @auto_renew_references.before_loop
     @get_car_list.before_loop
     async def _ready(self):
         await self.app.wait_until_ready()
 
-    async def renew_car_list(self):
-        lists = referenceManager.get_car_list()
-        name, cars = await asyncio.create_task(lists.get_list())
+    def publish(
+        self,
+        published : store.ReferenceSnapshot,
+        tables : Optional[dict[str, autocomplete.AutocompleteTable]] = None,
+    ):
+        """Makes `published` the snapshot every search reads from.
+        It only swaps references built beforehand, with autocomplete `tables` of them."""
+        if tables:
+            self.autocomplete_tables = {**self.autocomplete_tables, **tables}
+        self.snapshot = published
+
+    def build_stores(
+        self,
+        references : dict[str, list[models.ReferenceInfo]],
+    ) -> tuple[dict[str, store.ReferenceStore], dict[str, autocomplete.AutocompleteTable]]:
+        """Builds stores of `references` and autocomplete tables of them. This blocks."""
+        pool = store.StringPool()
+        stores = {name : self._build_store(name, items, pool) for name, items in references.items()}
+        tables = {
+            name : autocomplete.AutocompleteTable(stores[name].index(field))
+            for name, field in self.autocomplete_fields.items() if name in stores
+        }
+        return stores, tables
+
+    async def apply_stored_snapshot(self, stored : snapshot.StoredSnapshot):
+        """Serves references stored before restart until they are renewed."""
+        references : dict[str, list[models.ReferenceInfo]] = {}
+        car_list = None
+
+        def prepare():
+            nonlocal car_list
+            for manager in (*self.reference_managers, self.car_list_manager):
+                state = stored.sources.get(manager.name)
+                if state is None or not state.items:
+                    continue
+
+                manager.prime(state)
+                if isinstance(manager, referenceManager.ReferenceManager):
+                    references[manager.name] = state.items
+                else:
+                    car_list = state.items
+            return self.build_stores(references)
+
+        stores, tables = await asyncio.to_thread(prepare)
+        self.publish(self.snapshot.replace(references=stores, car_list=car_list, version=stored.version), tables)
+        self.logger.info(
+            "Loaded reference snapshot v%s saved at %s.",
+            stored.version, datetime.fromtimestamp(stored.created_at, timezone.utc).isoformat()
+        )
+
+    async def save_snapshot(self):
+        current = self.snapshot
+        sources = {
+            manager.name : manager.state(items)
+            for manager in (*self.reference_managers, self.car_list_manager)
+            if (items := self._items(current, manager))
+        }
+
+        try:
+            await asyncio.to_thread(snapshot.save_snapshot, sources, version=current.version)
+        except Exception as e:
+            self.logger.warning(f"Failed saving reference snapshot due to '{e}'.", exc_info=e)
+
+    @staticmethod
+    def _build_store(name : str, references : list[models.ReferenceInfo], pool : store.StringPool):
+        reference_store = store.ReferenceStore.from_references(name, references, pool=pool)
+        # search indexes are built here, not on the first search.
+        for field in ('car', 'track', 'cls'):
+            index = reference_store.index(field)
+            if field != 'cls':
+                # autocomplete shortlists candidates of these
+                index.build()
+        # so is every message of results
+        reference_store.prepare()
+        return reference_store
+
+    @staticmethod
+    def _items(current : store.ReferenceSnapshot, manager : referenceManager.CsvDataBaseManager):
+        if isinstance(manager, referenceManager.ReferenceManager):
+            return current.get(manager.name)
+        return current.car_list
+
+    async def renew_car_list(self, *, prepare : bool = True) -> bool:
+        """Renews car list. Returns whether it changed.
+        Searches are prepared again unless `prepare` is False."""
+        name, cars = await asyncio.create_task(self.car_list_manager.get_list())
+        status = self.car_list_manager.status
+        self.renew_status[name] = status
+
+        if status is referenceManager.RenewStatus.unchanged:
+            return False
 
         if not cars:
             self.logger.warning(f"Failed Renewing Car List.")
-            return
+            return False
 
-        setattr(self, name, cars)
+        try:
+            self.publish(self.snapshot.replace(car_list=cars))
+        except Exception as e:
+            self.car_list_manager.discard()
+            self.renew_status[name] = referenceManager.RenewStatus.failed
+            self.logger.warning(f"Failed applying car list due to '{e}'.", exc_info=e)
+            return False
+
+        # applied only once it is served
+        self.car_list_manager.commit()
         self.logger.info("Car List Renewed Successfully.")
-
-    async def renew_references(self):
-        """Renews References."""
+        await self.save_snapshot()
+        if prepare:
+            await self.prepare_searches(warm=False)
+        return True
+
+    async def renew_references(self, *, prepare : bool = True) -> bool:
+        """Renews References. Returns whether any of them changed.
+        Only changed sources are applied, and renewal info is updated only if any of them changed.
+        A source is committed only once it is published, so a failed one is applied again next time.
+        Searches are prepared again unless `prepare` is False."""
         renew_info: dict[str, Any] = {}
+        changed : dict[str, list[models.ReferenceInfo]] = {}
+        managers = {manager.name : manager for manager in self.reference_managers}
 
         async with asyncio.TaskGroup() as tg:
             tmp = [
-                tg.create_task(reference.get_list())
-                for reference in referenceManager.get_references()
+                tg.create_task(manager.get_list())
+                for manager in self.reference_managers
             ]
             
-        for result in tmp:
+        for manager, result in zip(self.reference_managers, tmp):
             name, reference = await result
-            count = f'{name}.count'
-            applied = f"{name}.applied"
+            status = manager.status
+            self.renew_status[name] = status
 
-            if count in renew_info and applied in renew_info:
+            if status is not referenceManager.RenewStatus.changed or not reference:
                 continue
 
-            if not reference:
+            if not manager.diff:
+                # payload changed, but none of its rows did.
+                manager.commit()
                 continue
+            changed[name] = reference
 
-            renew_info[count] = len(reference)
-            renew_info[applied] = format_dt(utcnow(), style="R")
+        if changed:
+            try:
+                renewed, tables = await asyncio.to_thread(self.build_stores, changed)
+                # every renewed mode is published at once
+                self.publish(self.snapshot.replace(references=renewed), tables)
 
-            setattr(self, f'{name}_reference', reference)
-            self.logger.info(f"{name} reference renewed.")
+            except Exception as e:
+                for name in changed:
+                    managers[name].discard()
+                    self.renew_status[name] = referenceManager.RenewStatus.failed
+                self.logger.warning(f"Failed applying renewed references due to '{e}'.", exc_info=e)
+
+            else:
+                for name, reference in changed.items():
+                    manager = managers[name]
+                    manager.commit()
+                    renew_info[f'{name}.count'] = len(reference)
+                    renew_info[f"{name}.applied"] = format_dt(utcnow(), style="R")
+                    self.logger.info(f"{name} reference renewed. ({manager.diff.summary()})")
+
+        self.logger.info(
+            "Reference renewal result : %s",
+            ', '.join(f'{name}={status.value}' for name, status in self.renew_status.items())
+        )
+        self.logger.info("Search cache : %s", fuzzy.query_cache.stats)
+        self.logger.info(
+            "Autocomplete : %s, refined=%d looked_up=%d",
+            self.autocomplete.stats, self.candidate_memory.refined, self.candidate_memory.looked_up
+        )
+
+        if not renew_info:
+            return False
 
         await self.app._db_renewed.find_one_and_update({}, {"$set" : renew_info})
+        await self.save_snapshot()
+        if prepare:
+            await self.prepare_searches()
+        return True
+
+    @staticmethod
+    def _warm_queries(values : list[str], limit : int) -> list[str]:
+        # what users type first, most shared prefixes first
+        prefixes = collections.Counter(
+            prefix for value in values
+            for prefix in {value[:length].lower() for length in (1, 2, 3)}
+        )
+        return [prefix for prefix, _ in prefixes.most_common(limit)]
+
+    def warm_search_cache(self) -> int:
+        """Scores first keystrokes of autocompletes in batch, so they hit the query cache.
+        Warmed queries take at most half of the cache, leaving the rest to live searches.
+        Returns the number of warmed entries still in the cache. This blocks."""
+        current = self.snapshot
+        names = [name for name in self.autocomplete_fields if current.get(name)]
+        if not names:
+            return 0
+
+        budget = fuzzy.query_cache.maxsize // 2 // len(names)
+        scopes = []
+        for name in names:
+            field = self.autocomplete_fields[name]
+            references = current[name]
+            queries = self._warm_queries(references.unique(field), budget)
+            fuzzy.extract_batch(queries, field, references, **self.autocomplete_options)
+            scopes.append((name, field))
+        return sum(fuzzy.query_cache.entries(scope) for scope in scopes)
+
+    def reconcile_car_list(self) -> None:
+        """Logs cars of references which are not in the car list, with their closest names. This blocks."""
+        current = self.snapshot
+        if not current.car_list:
+            return
+
+        index = searchIndex.SearchIndex.from_choices('car', current.car_list)
+        for manager in self.reference_managers:
+            references = current.get(manager.name)
+            if not references:
+                continue
+
+            missing = [car for car in references.unique('car') if index.lookup(car) is None]
+            if not missing:
+                continue
+
+            # only some of them are logged
+            closest = fuzzy.extract_batch(missing[:20], 'car', index, limit=1)
+            self.logger.warning(
+                "%s : %d car(s) not in car list. %s",
+                manager.name,
+                len(missing),
+                ', '.join(
+                    f"'{car}' ~ '{matches[0][0]}' ({matches[0][1]:.1f})" if matches else f"'{car}'"
+                    for car, matches in zip(missing, closest)
+                )
+            )
+
+    async def prepare_searches(self, *, warm : bool = True):
+        """Warms search cache and reconciles car list off the event loop."""
+        def prepare():
+            if warm:
+                started = datetime.now()
+                warmed = self.warm_search_cache()
+                self.logger.info("Search cache warmed, %d entries resident, in %s.", warmed, datetime.now() - started)
+            self.reconcile_car_list()
+
+        try:
+            await asyncio.to_thread(prepare)
+        except Exception as e:
+            self.logger.warning(f"Failed preparing searches due to '{e}'.", exc_info=e)
 
     @staticmethod
     async def search_failed_handler(interaction : Interaction, error : RuntimeError):
@@ -124,10 +378,22 @@ class Reference(commands.Cog):
                 content += 'Found ' + temp
         return content
     
-    async def send_reference(self, interaction : Interaction, reference : list[models.ReferenceInfo], **kwargs):
+    async def send_reference(self, interaction : Interaction, reference : store.ReferenceStore, **kwargs):
         try:
             fields = {k: v for k, v in kwargs.items() if v is not None}
-            result = fuzzy.search_references(fields, reference, score_cutoff=60)
+            sampled = explain.SearchExplain() if random.random() < search_explain_sample_rate else None
+            try:
+                result = await self.search_executor.run(
+                    fuzzy.search_references,
+                    fields,
+                    reference,
+                    size=len(reference),
+                    score_cutoff=60,
+                    explain=sampled
+                )
+            finally:
+                if sampled is not None:
+                    self.logger.info("[Search explain] %s : %s", reference.name, sampled.summary())
             
             references = result['references']
             details = result['detail']
@@ -146,38 +412,76 @@ class Reference(commands.Cog):
             else:
                 raise RuntimeError('Sorry, There was something wrong.')
             
-        except (RuntimeError, ValueError) as e:
+        except (RuntimeError, ValueError, exception.SearchBusy) as e:
             await self.search_failed_handler(interaction, e)
 
     @staticmethod
     async def send_one(
         interaction : Interaction,
         *,
-        reference : models.ReferenceInfo,
+        reference : store.ReferenceRow,
         content : str = "",
     ):        
-        content += "\n" + stringformat.one_reference_string(reference)
+        content += "\n" + renderCache.rendered(reference)
 
         if interaction.response.is_done():
             await interaction.followup.send(content)
         else:
             await interaction.response.send_message(content)
 
+    def autocomplete_table(self, name : str, current : store.ReferenceSnapshot) -> autocomplete.AutocompleteTable:
+        """Returns autocomplete table of references of `name` in `current`, building it if they changed."""
+        index = current[name].index(self.autocomplete_fields[name])
+        table = self.autocomplete_tables.get(name)
+        if table is None or table.index is not index:
+            table = self.autocomplete_tables[name] = autocomplete.AutocompleteTable(index)
+        return table
+
+    async def autocomplete_choices(
+        self,
+        interaction : Interaction,
+        current : str,
+        name : str,
+    ) -> List[app_commands.Choice[str]]:
+        """Choices of autocomplete field of `name` matching `current`, searched by the search executor.
+        Nothing is suggested while the executor is busy, or if a newer keystroke came."""
+        field = self.autocomplete_fields[name]
+        published = self.snapshot
+        references = published[name]
+        table = self.autocomplete_table(name, published)
+        if not searchIndex.strip(current):
+            return table.choose(current, ())
+
+        key = self.autocomplete.key(interaction, field)
+        index = table.index
+
+        def shortlist() -> Optional[list[int]]:
+            # narrows candidates of the previous keystroke
+            return self.candidate_memory.shortlist(
+                key,
+                index,
+                current,
+                min_candidates=self.autocomplete_options['min_candidates']
+            )
+
+        def search_positions() -> list[int]:
+            matches = fuzzy.extract_group(current, field, references, raw=True, shortlist=shortlist, **self.autocomplete_options)
+            return [position for _, _, position in matches]
+
+        async def search() -> list[int]:
+            try:
+                return await self.search_executor.run(search_positions, size=len(index))
+            except exception.SearchBusy:
+                return []
+
+        return table.choose(current, await self.autocomplete.dispatch(key, search, default=[]))
+
     async def carhunt_autocompletion(
         self,
         interaction: Interaction,
         current: str
     ) -> List[app_commands.Choice[str]]:
-
-        if not current:
-            result: list[str] = [a.car for a in self.carhunt_reference.copy()]
-        else:
-            result: list[str] = fuzzy.extract_group(current, 'car', self.carhunt_reference.copy())
-
-        return [
-           app_commands.Choice(name=choice, value=choice) for choice in result
-           if current.lower().replace(" ", "") in choice.lower().replace(" ", "")
-       ][:25]
+        return await self.autocomplete_choices(interaction, current, 'carhunt')
 
     @app_commands.command(
         description='You can watch Car hunt Riot videos!',
@@ -191,24 +495,14 @@ class Reference(commands.Cog):
     @app_commands.autocomplete(car=carhunt_autocompletion)
     async def carhunt(self, interaction : Interaction, car : str):
         await interaction.response.defer(thinking=True)
-        await self.send_reference(interaction, self.carhunt_reference.copy(), car=car) # reference params
+        await self.send_reference(interaction, self.snapshot['carhunt'], car=car) # reference params
 
     async def gauntlet_autocompletion(
         self,
         interaction : Interaction,
         current : str
     ) -> List[app_commands.Choice[str]]:
-
-        if not current:
-            result: list[str] = list(set([a.track for a in self.gauntlet_reference.copy()]))
-        else:
-            result: list[str] = fuzzy.extract_group(current, 'track', self.gauntlet_reference.copy())
-
-        return [
-           app_commands.Choice(name=choice, value=choice)
-           for choice in result
-           if current.lower().replace(' ', '') in choice.lower().replace(' ', '')
-       ][:25]
+        return await self.autocomplete_choices(interaction, current, 'gauntlet')
 
     @app_commands.command(
         description='Search Gauntlet References!',
@@ -222,7 +516,7 @@ class Reference(commands.Cog):
     @app_commands.autocomplete(track=gauntlet_autocompletion)
     async def gauntlet(self, interaction: Interaction, track: str):
         await interaction.response.defer(thinking=True)
-        await self.send_reference(interaction, self.gauntlet_reference.copy(), track=track)  # reference params
+        await self.send_reference(interaction, self.snapshot['gauntlet'], track=track)  # reference params
     
     @app_commands.command(
         description='Let you know elite cup reference!',
@@ -240,24 +534,14 @@ class Reference(commands.Cog):
         cls : Literal["S", "A", "B", "C"], 
     ):  
         await interaction.response.defer(thinking=True)
-        await self.send_reference(interaction, self.elite_reference.copy(), cls=cls)
+        await self.send_reference(interaction, self.snapshot['elite'], cls=cls)
 
     async def weekly_autocompletion(
         self,
         interaction: Interaction,
         current: str,
     ) -> List[app_commands.Choice[str]]:
-
-        if not current:
-            matches: list[str] = list(set([a.track for a in self.weekly_reference.copy()]))
-        else:
-            matches: list[str] = fuzzy.extract_group(current, 'track', self.weekly_reference.copy())
-
-        return [
-           app_commands.Choice(name=choice, value=choice)
-           for choice in matches
-           if current.lower().replace(' ', '') in choice.lower().replace(' ', '')
-       ][:25]
+        return await self.autocomplete_choices(interaction, current, 'weekly')
 
     @app_commands.command(
         description='Let you know Weekly Competition references!',
@@ -275,7 +559,7 @@ class Reference(commands.Cog):
         track : str,
     ):      
         await interaction.response.defer(thinking=True)
-        await self.send_reference(interaction, self.weekly_reference.copy(), track=track)
+        await self.send_reference(interaction, self.snapshot['weekly'], track=track)
 
 
 async def setup(app : Al9oo):
@@ -33,6 +33,18 @@ elwh = os.environ.get('ERROR_LOG_WH')
 
 feedback_log_channel = os.environ.get('FEEDBACK_LOG_CHANNEL')
 
+# share of reference searches whose explain is logged
+search_explain_sample_rate = float(os.environ.get('SEARCH_EXPLAIN_SAMPLE_RATE', 0))
+
+# 'thread' runs searches in a thread pool, 'inline' runs them on the event loop
+search_executor_mode = os.environ.get('SEARCH_EXECUTOR_MODE', 'thread')
+search_workers = int(os.environ.get('SEARCH_WORKERS', 2))
+search_max_pending = int(os.environ.get('SEARCH_MAX_PENDING', 32))
+# searches over this many values or less run inline
+search_inline_threshold = int(os.environ.get('SEARCH_INLINE_THRESHOLD', 2000))
+# seconds an autocomplete request waits while the same user keeps typing
+autocomplete_debounce = float(os.environ.get('AUTOCOMPLETE_DEBOUNCE', 0.15))
+
 al9oo_main_announcement = 1160568027377578034
 al9oo_urgent_alert = 1161584379571744830
 
@@ -1,8 +1,17 @@
+from .autocomplete import *
+from .cache import *
 from .check import *
 from .embed_color import *
 from .exception import *
+from .explain import *
+from .fetcher import *
 from .fuzzy import *
 from .models import *
 from .paginator import *
 from .referenceManager import *
+from .renderCache import *
+from .searchExecutor import *
+from .searchIndex import *
+from .snapshot import *
+from .store import *
 from .stringformat import *
\ No newline at end of file
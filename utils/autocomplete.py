@@ -0,0 +1,238 @@
+from __future__ import annotations
+from collections import OrderedDict
+from discord import app_commands, Interaction
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Iterator, NamedTuple, Optional, TypeVar
+from .searchIndex import SearchIndex, strip
+
+import asyncio
+import itertools
+import threading
+import time
+
+
+__all__ = (
+    "AutocompleteStats",
+    "AutocompleteDispatcher",
+    "AutocompleteTable",
+    "CandidateMemory",
+)
+
+
+T = TypeVar('T')
+
+# maximum number of choices Discord shows
+MAX_CHOICES = 25
+
+AutocompleteKey = tuple[int, Optional[str], str]
+
+
+class AutocompleteStats(NamedTuple):
+    served : int
+    dropped : int
+
+    def __str__(self) -> str:
+        total = self.served + self.dropped
+        rate = self.dropped / total * 100 if total else 0.0
+        return f'served={self.served} dropped={self.dropped} ({rate:.1f}% dropped)'
+
+
+class AutocompleteDispatcher:
+    """Runs autocomplete searches of each (user, command, option) one at a time.
+
+    A request is searched at once, unless the previous request of the same key
+    arrived less than `debounce` seconds ago. Then it is in a burst and waits
+    `debounce` seconds first, and a newer request of the same key cancels one
+    still waiting, so only the last keystroke of a burst is searched.
+    A search already submitted is never cancelled, since its worker would keep running.
+    Its result is dropped instead if a newer request came meanwhile,
+    as Discord discards the response anyway.
+
+    Args:
+        debounce: Seconds between requests of a burst, and how long they wait.
+    """
+    # number of arrival times kept before stale ones are dropped
+    max_arrivals = 1024
+
+    def __init__(self, *, debounce : float = 0.15) -> None:
+        self.debounce = debounce
+        self._tasks : dict[Hashable, asyncio.Task] = {}
+        self._waiting : set[asyncio.Task] = set()
+        self._arrivals : dict[Hashable, float] = {}
+        self._served = 0
+        self._dropped = 0
+
+    @staticmethod
+    def key(interaction : Interaction, option : str) -> AutocompleteKey:
+        command = interaction.command.qualified_name if interaction.command else None
+        return interaction.user.id, command, option
+
+    def _in_burst(self, key : Hashable) -> bool:
+        """Records arrival of a request of `key`, and returns whether the previous one came within `debounce`."""
+        now = time.monotonic()
+        previous = self._arrivals.pop(key, None)
+        self._arrivals[key] = now
+
+        if len(self._arrivals) > self.max_arrivals:
+            self._arrivals = {k : at for k, at in self._arrivals.items() if now - at < self.debounce}
+        return previous is not None and now - previous < self.debounce
+
+    async def _run(self, key : Hashable, search : Callable[[], Awaitable[T]], debounce : bool) -> T:
+        task = asyncio.current_task()
+        if debounce:
+            self._waiting.add(task)
+            try:
+                await asyncio.sleep(self.debounce)
+            finally:
+                self._waiting.discard(task)
+
+        if self._tasks.get(key) is not task:
+            # superseded, so nothing is submitted
+            raise asyncio.CancelledError
+        return await search()
+
+    async def dispatch(self, key : Hashable, search : Callable[[], Awaitable[T]], *, default : T) -> T:
+        """Returns result of `search()`, or `default` if a newer request of `key` superseded it."""
+        in_burst = self.debounce > 0 and self._in_burst(key)
+        previous = self._tasks.get(key)
+        if previous is not None and previous in self._waiting:
+            previous.cancel()
+
+        task = self._tasks[key] = asyncio.ensure_future(self._run(key, search, in_burst))
+        try:
+            result = await task
+
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if current is not None and current.cancelling():
+                # the caller itself was cancelled
+                raise
+            self._dropped += 1
+            return default
+
+        finally:
+            superseded = self._tasks.get(key) is not task
+            if not superseded:
+                del self._tasks[key]
+
+        if superseded:
+            self._dropped += 1
+            return default
+
+        self._served += 1
+        return result
+
+    @property
+    def stats(self) -> AutocompleteStats:
+        return AutocompleteStats(served=self._served, dropped=self._dropped)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+
+class _Remembered(NamedTuple):
+    version : int
+    query : str
+    positions : Optional[list[int]]
+    at : float
+
+
+class CandidateMemory:
+    """Remembers the last shortlist of each (user, command, option) for a while.
+
+    While a user types "chi" -> "chir" -> "chiro", every query contains the
+    previous one, so only values shortlisted for the previous one can contain it.
+    Those are narrowed instead of looking up the whole index again.
+
+    Args:
+        ttl: Seconds a shortlist is remembered.
+        maxsize: Maximum number of remembered shortlists.
+    """
+    def __init__(self, *, ttl : float = 30.0, maxsize : int = 1024) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries : OrderedDict[Hashable, _Remembered] = OrderedDict()
+        self._lock = threading.Lock()
+        self.refined = 0
+        self.looked_up = 0
+
+    def _previous(self, key : Hashable, index : SearchIndex[Any], query : str, now : float) -> Optional[list[int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if (
+            entry is None
+            or entry.positions is None
+            or not entry.query
+            or entry.version != index.version
+            or now - entry.at > self.ttl
+            or entry.query not in query
+            # looking up n-grams is faster than narrowing most of values
+            or len(entry.positions) > len(index) // 4
+        ):
+            return None
+        return entry.positions
+
+    def shortlist(
+        self,
+        key : Hashable,
+        index : SearchIndex[Any],
+        query : str,
+        *,
+        min_candidates : int = 25,
+    ) -> Optional[list[int]]:
+        """Same as `index.shortlist(query, min_candidates=min_candidates)`, narrowing
+        the last shortlist of `key` when `query` extends its query. It is remembered for next one.
+        This may block, so run it where searches run."""
+        stripped = strip(query)
+        now = time.monotonic()
+
+        previous = self._previous(key, index, stripped, now)
+        if previous is None:
+            self.looked_up += 1
+        else:
+            self.refined += 1
+        positions = index.shortlist(query, min_candidates=min_candidates, within=previous)
+
+        with self._lock:
+            self._entries[key] = _Remembered(index.version, stripped, positions, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return positions
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AutocompleteTable:
+    """Choices of one field of a snapshot, built once with the snapshot.
+
+    Every distinct value has its `Choice` and its space-stripped lowercased key,
+    so answering an autocomplete only picks up to 25 of them.
+
+    Args:
+        index: Search index of the field.
+    """
+    __slots__ = ('index', 'keys', 'choices', 'defaults')
+
+    def __init__(self, index : SearchIndex[Any]) -> None:
+        self.index = index
+        # shared with the candidate filter of the index
+        self.keys = index.candidate_filter.stripped
+        self.choices = [app_commands.Choice(name=value, value=value) for value in index.values]
+        # choices of empty query, in order of first appearance
+        self.defaults = self.choices[:MAX_CHOICES]
+
+    def _matching(self, current : str, positions : Iterable[int]) -> Iterator[app_commands.Choice[str]]:
+        key = strip(current)
+        keys, choices = self.keys, self.choices
+        return (choices[p] for p in positions if key in keys[p])
+
+    def choose(self, current : str, positions : Iterable[int]) -> list[app_commands.Choice[str]]:
+        """Returns up to 25 choices of values at `positions` containing `current`, in their order."""
+        if not strip(current):
+            return list(self.defaults)
+        return list(itertools.islice(self._matching(current, positions), MAX_CHOICES))
+
+    def __len__(self) -> int:
+        return len(self.choices)
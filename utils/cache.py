@@ -0,0 +1,149 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+import sys
+import threading
+
+
+__all__ = (
+    "CacheStats",
+    "QueryCache",
+)
+
+
+MB = 1024 * 1024
+
+
+class CacheStats(NamedTuple):
+    hits : int
+    misses : int
+    evictions : int
+    invalidations : int
+    entries : int
+    bytes : int
+
+    def __str__(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return (
+            f'hits={self.hits} misses={self.misses} ({rate:.1f}% hit) '
+            f'evictions={self.evictions} invalidations={self.invalidations} '
+            f'entries={self.entries} bytes={self.bytes}'
+        )
+
+
+def approximate_size(value : Any) -> int:
+    """Size of `value` plus shallow size of items of lists, tuples and dict values."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(sys.getsizeof(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(approximate_size(item) for item in value.values())
+    return size
+
+
+class QueryCache:
+    """Bounded LRU cache of search results.
+
+    Keys are `(scope, key, version)`. `scope` is usually (mode, field),
+    and version is the version of search index the result came from.
+    When a scope is seen with a newer version, its old entries are dropped,
+    so renewed references never return stale results.
+
+    Args:
+        maxsize: Maximum number of entries.
+        max_bytes: Maximum approximate size of all entries.
+    """
+    def __init__(self, *, maxsize : int = 4096, max_bytes : int = 16 * MB) -> None:
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries : OrderedDict[tuple[Hashable, Hashable], tuple[Any, int]] = OrderedDict()
+        self._versions : dict[Hashable, Hashable] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def _check_version(self, scope : Hashable, version : Any) -> bool:
+        """Returns whether `version` is the latest one of `scope`."""
+        current = self._versions.get(scope)
+        if current == version:
+            return True
+
+        if current is not None and version < current:
+            # result of search that started before renewal
+            return False
+
+        self._versions[scope] = version
+        if current is not None:
+            stale = [key for key in self._entries if key[0] == scope]
+            for key in stale:
+                _, size = self._entries.pop(key)
+                self._bytes -= size
+            self._invalidations += 1
+        return True
+
+    def get(self, scope : Hashable, key : Hashable, version : Any) -> Optional[Any]:
+        with self._lock:
+            if not self._check_version(scope, version):
+                self._misses += 1
+                return None
+
+            try:
+                value, _ = self._entries[(scope, key)]
+            except KeyError:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end((scope, key))
+            self._hits += 1
+            return value
+
+    def put(self, scope : Hashable, key : Hashable, version : Any, value : Any) -> None:
+        size = approximate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if not self._check_version(scope, version):
+                return
+
+            old = self._entries.pop((scope, key), None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[(scope, key)] = (value, size)
+            self._bytes += size
+
+            while len(self._entries) > self.maxsize or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._evictions += 1
+
+    def entries(self, scope : Hashable) -> int:
+        """Returns the number of entries of `scope`."""
+        with self._lock:
+            return sum(1 for key in self._entries if key[0] == scope)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._bytes = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            invalidations=self._invalidations,
+            entries=len(self._entries),
+            bytes=self._bytes,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
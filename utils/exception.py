@@ -90,4 +90,10 @@ class AlreadyFollowing(AlgooError):
     def __init__(self, *args: discord.TextChannel) -> None:
         following_channel_mention = ', '.join(s.mention for s in args)
         self.message = f'You already following {following_channel_mention}'
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+class SearchBusy(AlgooError):
+    """Raised when too many searches are waiting for the search executor."""
+    def __init__(self) -> None:
+        self.message = 'Too many searches are running now. Please try again in a moment.'
+        super().__init__(self.message)
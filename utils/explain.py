@@ -0,0 +1,108 @@
+from __future__ import annotations
+from typing import Iterator, NamedTuple, Optional
+
+import contextlib
+import time
+
+
+__all__ = (
+    "CandidateExplain",
+    "FieldExplain",
+    "SearchExplain",
+)
+
+
+class CandidateExplain(NamedTuple):
+    value : str
+    position : int
+    token_set : float
+    token_sort : float
+    partial_token : float
+    oc_adjust : float
+    score : float
+
+
+class FieldExplain:
+    """What a search of one field did."""
+    __slots__ = ('field', 'query', 'values', 'scored', 'exact', 'candidates', 'rows')
+
+    def __init__(self, field : str, query : str, values : int) -> None:
+        self.field = field
+        self.query = query
+        self.values = values
+        # number of values scored, or None if an exact lookup answered
+        self.scored : Optional[int] = None
+        self.exact = False
+        self.candidates : list[CandidateExplain] = []
+        self.rows : Optional[int] = None
+
+
+class SearchExplain:
+    """Collects scores and timings of a search.
+
+    Pass it as `explain` to `fuzzy.extract_group` or `fuzzy.search_references`.
+    Searches with it skip the query cache, so timings are of real work.
+
+    Stages are `normalise`, `candidates` (shortlist and exact lookup),
+    `scoring`, `post-filter` (cutoff, ranking and limit) and `rows` (row resolution).
+    Top-k extraction ranks while scoring, so its post-filter is part of scoring.
+
+    Args:
+        top: Number of best candidates of each field to explain.
+    """
+    def __init__(self, *, top : int = 5) -> None:
+        self.top = top
+        self.stages : dict[str, float] = {}
+        self.fields : list[FieldExplain] = []
+        self.plan : list[str] = []
+        self.error : Optional[str] = None
+
+    @contextlib.contextmanager
+    def stage(self, name : str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def add_field(self, field : str, query : str, values : int) -> FieldExplain:
+        explained = FieldExplain(field, query, values)
+        self.fields.append(explained)
+        return explained
+
+    @property
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def summary(self) -> str:
+        """One line summary, for logs."""
+        stages = ' '.join(f'{name}={seconds * 1000:.3f}ms' for name, seconds in self.stages.items())
+        fields = ' '.join(
+            f'{f.field}={f.query!r}->{f.candidates[0].value if f.candidates else None!r}'
+            f'({"exact" if f.exact else f"{f.scored}/{f.values} scored"})'
+            for f in self.fields
+        )
+        return f'{fields} total={self.total * 1000:.3f}ms {stages}'
+
+    def render(self) -> str:
+        lines = []
+        if self.plan:
+            lines.append(f'plan : {" -> ".join(self.plan)}')
+
+        for f in self.fields:
+            scored = 'exact lookup' if f.exact else f'{f.scored}/{f.values} values scored'
+            rows = '' if f.rows is None else f', {f.rows} rows'
+            lines.append(f'[{f.field}] {f.query!r} : {scored}{rows}')
+            for c in f.candidates:
+                lines.append(
+                    f'  {c.score:6.2f} = set {c.token_set:6.2f} / sort {c.token_sort:6.2f} '
+                    f'/ partial {c.partial_token:6.2f} / oc {c.oc_adjust:+.1f}  {c.value}'
+                )
+
+        lines.append(f'total {self.total * 1000:.3f} ms')
+        for name, seconds in self.stages.items():
+            lines.append(f'  {name:<12} {seconds * 1000:9.3f} ms')
+
+        if self.error:
+            lines.append(f'error : {self.error}')
+        return '\n'.join(lines)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+from aiohttp import ClientResponse, ClientSession, ClientTimeout, TCPConnector
+from typing import AsyncIterator, Mapping, Optional
+
+import contextlib
+import logging
+
+
+__all__ = (
+    "SheetFetcher",
+)
+
+
+log = logging.getLogger(__name__)
+
+
+class SheetFetcher:
+    """Long-lived HTTP client shared by every reference sheet download.
+
+    One connector is kept for the whole bot lifetime, so renewals reuse
+    kept-alive connections instead of doing a new TLS handshake per sheet.
+
+    Args:
+        limit: Maximum number of simultaneous connections.
+        limit_per_host: Maximum number of simultaneous connections per host.
+        keepalive_timeout: Seconds an idle connection is kept alive.
+        timeout: Total timeout (seconds) of one request.
+        connect_timeout: Timeout (seconds) to acquire and open a connection.
+    """
+    def __init__(
+        self,
+        *,
+        limit : int = 10,
+        limit_per_host : int = 4,
+        keepalive_timeout : float = 75.0,
+        timeout : float = 30.0,
+        connect_timeout : float = 10.0,
+    ) -> None:
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = ClientTimeout(total=timeout, connect=connect_timeout)
+        self._session : Optional[ClientSession] = None
+
+    def _create_session(self) -> ClientSession:
+        connector = TCPConnector(
+            limit=self._limit,
+            limit_per_host=self._limit_per_host,
+            keepalive_timeout=self._keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        return ClientSession(connector=connector, timeout=self._timeout)
+
+    @property
+    def session(self) -> ClientSession:
+        # Created lazily so that it is always bound to the running event loop.
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    @contextlib.asynccontextmanager
+    async def request(
+        self,
+        url : str,
+        *,
+        headers : Optional[Mapping[str, str]] = None,
+    ) -> AsyncIterator[ClientResponse]:
+        """Sends GET request and yields the response.
+        The connection is released back to the pool on exit.
+
+        Args:
+            url: URL to request.
+            headers: Extra request headers.
+        """
+        async with self.session.get(url, headers=headers) as response:
+            yield response
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            log.info('Sheet fetcher session closed.')
+        self._session = None
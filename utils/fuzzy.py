@@ -1,22 +1,44 @@
 from __future__ import annotations
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from typing import (
     Any,
     Sequence,
     TypeVar,
     Callable,
-    Generator,
     Literal,
     TypedDict,
     Optional,
     overload,
 )
 from rapidfuzz import fuzz, process
+from .cache import QueryCache
+from .explain import CandidateExplain, SearchExplain
 from .models import ReferenceInfo, DetailByField
+from .searchIndex import SearchIndex, has_oc_token, normalise
+from .store import ReferenceStore
+
+import contextlib
+import heapq
+import numpy as np
 
 
 T = TypeVar('T')
 
+# number of scored pairs from which scoring uses every CPU core.
+parallel_threshold = 20_000
+
+# values fully scored per round of top-k extraction.
+top_k_chunk = 256
+
+# maximum number of (query, value) scores held at once by batch extraction.
+batch_cells = 1_000_000
+
+# fields with a few fixed values. They are cheap to match, so compound searches match them first.
+enumerated_fields = frozenset({'cls'})
+
+# results of searches over named indexes, invalidated when they are rebuilt.
+query_cache = QueryCache()
+
 
 @dataclass
 class SearchResult(TypedDict):
@@ -24,15 +46,6 @@ class SearchResult(TypedDict):
     detail : list[DetailByField]
 
 
-def _get_field_values(choices: Sequence[T], field: str) -> Generator[T, None, None]:
-    """Extract unique field values from choices"""
-    temp = set(
-        item[field] if isinstance(item, dict) else getattr(item, field)
-        for item in choices
-    )
-    return (item for item in temp)
-    
-    
 def ratio(scores : Sequence[T], bounties : Sequence[T]) -> T:
     assert len(scores) == len(bounties) and sum(bounties) == 1
     
@@ -40,47 +53,256 @@ def ratio(scores : Sequence[T], bounties : Sequence[T]) -> T:
     return sum([scores[i] * bounties[i] for i in range(length)])
     
 
-def _oc_scorer(query : str, choice : str, **kwargs) -> float:
-    query.lower()
-    choice.lower()
-    
-    is_car = kwargs.pop('car', None)
-    
+def _oc_adjust(score : float, query_oc : bool, choice_oc : bool) -> float:
+    if query_oc:
+        # choice에도 독립된 'oc' 토큰이 있으면 점수 소폭 상승
+        if choice_oc:
+            score += 2.2
+
+    # query에 독립된 'oc' 토큰이 없는데
+    elif choice_oc:
+        # choice에 독립된 'oc' 토큰이 있으면 점수 소폭 하락
+        score -= 1.0
+    return score
+
+
+def _base_score(query : str, choice : str, **kwargs) -> float:
     sort_score = fuzz.token_sort_ratio(query, choice, **kwargs)
     ratio_score = fuzz.token_set_ratio(query, choice, **kwargs)
     simple_score = fuzz.partial_token_ratio(query, choice, **kwargs)
     
-    base_score = ratio((ratio_score, sort_score, simple_score), (0.22, 0.15, 0.63))
+    return ratio((ratio_score, sort_score, simple_score), (0.22, 0.15, 0.63))
+
+
+def _oc_scorer(query : str, choice : str, **kwargs) -> float:
+    is_car = kwargs.pop('car', None)
     
-    query_tokens = set(query.split())
-    choice_tokens = set(choice.split())
+    base_score = _base_score(query, choice, **kwargs)
     
-    # query에 독립된 'oc' 토큰이 없는데
     if is_car:
-        if 'oc' in query_tokens or '(oc)' in query_tokens:
-        
-        # choice에도 독립된 'oc' 토큰이 있으면 점수 소폭 상승
-            if 'oc' in choice_tokens or '(oc)' in choice_tokens:
-                base_score += 2.2
-        
-        # query에 독립된 'oc' 토큰이 없는데
-        elif 'oc' in choice_tokens or '(oc)' in choice_tokens:
-            # choice에 독립된 'oc' 토큰이 있으면 점수 소폭 하락
-            base_score -= 1.0
+        base_score = _oc_adjust(base_score, has_oc_token(query.split()), has_oc_token(choice.split()))
 
     if base_score >= 100.0:
         return 100.0
     return base_score
 
 
+def _as_index(choices : Sequence[T] | SearchIndex[T], field : str) -> Optional[SearchIndex[T]]:
+    if isinstance(choices, ReferenceStore):
+        return choices.index(field)
+
+    if isinstance(choices, SearchIndex):
+        if choices.field != field:
+            raise ValueError(f'Search index of `{choices.field}` can not search `{field}`.')
+        return choices
+    return None
+
+
+def _no_stage(name : str) -> contextlib.AbstractContextManager:
+    return contextlib.nullcontext()
+
+
+def _workers(size : int) -> int:
+    return -1 if size >= parallel_threshold else 1
+
+
+def _score_matrix(
+    queries : Sequence[str],
+    index : SearchIndex[T],
+    *,
+    score_cutoff : float,
+    positions : Optional[Sequence[int]] = None,
+    workers : Optional[int] = None,
+) -> np.ndarray:
+    """Scores normalised `queries` against values of `index` at `positions`
+    (or every value) at once. It returns the same scores as `_oc_scorer`,
+    in shape of (queries, values)."""
+    if positions is None:
+        choices, oc = index.normalised, index.oc
+    else:
+        choices = [index.normalised[p] for p in positions]
+        oc = [index.oc[p] for p in positions]
+
+    kwargs = {
+        'score_cutoff' : score_cutoff,
+        'workers' : _workers(len(choices) * len(queries)) if workers is None else workers,
+        'dtype' : np.float64,
+    }
+    ratio_score = process.cdist(queries, choices, scorer=fuzz.token_set_ratio, **kwargs)
+    sort_score = process.cdist(queries, choices, scorer=fuzz.token_sort_ratio, **kwargs)
+    simple_score = process.cdist(queries, choices, scorer=fuzz.partial_token_ratio, **kwargs)
+
+    # same order of operations as `ratio`, so results are bit-identical
+    scores = ratio_score * 0.22
+    scores += sort_score * 0.15
+    scores += simple_score * 0.63
+
+    if index.field == 'car':
+        choice_oc = np.fromiter(oc, dtype=bool, count=len(choices))
+        query_oc = np.fromiter((has_oc_token(q.split()) for q in queries), dtype=bool, count=len(queries))
+        scores[np.ix_(query_oc, choice_oc)] += 2.2
+        scores[np.ix_(~query_oc, choice_oc)] -= 1.0
+
+    np.minimum(scores, 100.0, out=scores)
+    return scores
+
+
+def _rank(scores : np.ndarray, score_cutoff : float, limit : Optional[int] = None) -> np.ndarray:
+    """Returns positions of scores passing `score_cutoff`, best first.
+    Ties keep their order, like `process.extract`."""
+    passed = np.flatnonzero(scores >= score_cutoff)
+    return passed[np.argsort(-scores[passed], kind='stable')][:limit]
+
+
+def _score_top(
+    query : str,
+    index : SearchIndex[T],
+    positions : Sequence[int],
+    *,
+    score_cutoff : float,
+    limit : int,
+) -> list[tuple[float, int]]:
+    """Returns best `limit` (score, position) pairs of normalised `query`, best first.
+
+    token_set and token_sort ratios are scored for every value first. As
+    partial_token_ratio is at most 100, they give an upper bound of each score,
+    so values are fully scored in order of the bound, and scoring stops
+    once the bound can not beat the k-th best score so far.
+    Scores are the same as `_score_matrix`.
+    """
+    choices = [index.normalised[p] for p in positions]
+    kwargs = {
+        'score_cutoff' : score_cutoff,
+        'workers' : _workers(len(choices)),
+        'dtype' : np.float64,
+    }
+    ratio_score = process.cdist([query], choices, scorer=fuzz.token_set_ratio, **kwargs)[0]
+    sort_score = process.cdist([query], choices, scorer=fuzz.token_sort_ratio, **kwargs)[0]
+
+    # same order of operations as `_score_matrix`
+    partial = ratio_score * 0.22
+    partial += sort_score * 0.15
+
+    adjust = np.zeros(len(choices))
+    if index.field == 'car':
+        choice_oc = np.fromiter((index.oc[p] for p in positions), dtype=bool, count=len(choices))
+        adjust[choice_oc] = 2.2 if has_oc_token(query.split()) else -1.0
+
+    bound = np.minimum(partial + 63.0 + adjust, 100.0)
+    candidates = np.flatnonzero(bound >= score_cutoff)
+    order = candidates[np.argsort(-bound[candidates], kind='stable')]
+
+    # (score, -position), so the worst of kept ones is on top
+    heap : list[tuple[float, int]] = []
+    kwargs['workers'] = 1
+    for start in range(0, len(order), top_k_chunk):
+        chunk = order[start:start + top_k_chunk]
+        threshold = heap[0][0] if len(heap) == limit else score_cutoff
+        if bound[chunk[0]] < threshold:
+            break
+
+        simple_score = process.cdist([query], [choices[i] for i in chunk], scorer=fuzz.partial_token_ratio, **kwargs)[0]
+        scores = partial[chunk] + simple_score * 0.63
+        scores += adjust[chunk]
+        np.minimum(scores, 100.0, out=scores)
+
+        for i in np.flatnonzero(scores >= threshold):
+            item = (float(scores[i]), -positions[chunk[i]])
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    return [(score, -position) for score, position in sorted(heap, reverse=True)]
+
+
+def _extract_indexed(
+    query : str,
+    index : SearchIndex[T],
+    *,
+    scorer : Optional[Callable[[str, str], float]],
+    score_cutoff : float,
+    scorer_kwargs : Optional[dict[str, Any]],
+    positions : Optional[Sequence[int]] = None,
+    limit : Optional[int] = None,
+    stage : Callable[[str], contextlib.AbstractContextManager] = _no_stage,
+) -> list[tuple[str, float, int]]:
+    """Same as `process.extract` over distinct values, but uses pre-normalised values of `index`.
+    Only values at sorted `positions` are scored if given."""
+    with stage('normalise'):
+        query = normalise(query)
+    values = index.values
+    if positions is None:
+        positions = range(len(values))
+
+    if scorer is not None:
+        with stage('scoring'):
+            matches = process.extract(
+                query,
+                [index.normalised[p] for p in positions],
+                scorer=scorer,
+                score_cutoff=score_cutoff,
+                limit=limit,
+                scorer_kwargs=scorer_kwargs
+            )
+        return [(values[positions[i]], score, positions[i]) for _, score, i in matches]
+
+    if not positions or limit == 0:
+        return []
+
+    if limit is not None and len(positions) > max(limit, top_k_chunk):
+        with stage('scoring'):
+            top = _score_top(query, index, positions, score_cutoff=score_cutoff, limit=limit)
+        return [(values[position], score, position) for score, position in top]
+
+    with stage('scoring'):
+        scores = _score_matrix([query], index, score_cutoff=score_cutoff, positions=positions)[0]
+    with stage('post-filter'):
+        return [(values[positions[i]], float(scores[i]), positions[i]) for i in _rank(scores, score_cutoff, limit)]
+
+
+def _explain_candidates(
+    query : str,
+    index : SearchIndex[T],
+    matches : Sequence[tuple[str, float, int]],
+    score_cutoff : float,
+) -> list[CandidateExplain]:
+    """Scores each component of `matches` again, for explain."""
+    query = normalise(query)
+    query_oc = has_oc_token(query.split())
+    explained = []
+
+    for value, score, position in matches:
+        choice = index.normalised[position]
+        oc_adjust = 0.0
+        if index.field == 'car':
+            oc_adjust = _oc_adjust(0.0, query_oc, index.oc[position])
+
+        explained.append(CandidateExplain(
+            value=value,
+            position=position,
+            token_set=fuzz.token_set_ratio(query, choice, score_cutoff=score_cutoff),
+            token_sort=fuzz.token_sort_ratio(query, choice, score_cutoff=score_cutoff),
+            partial_token=fuzz.partial_token_ratio(query, choice, score_cutoff=score_cutoff),
+            oc_adjust=oc_adjust,
+            score=score,
+        ))
+    return explained
+
+
 @overload
 def extract_group(
     query : str,
     field : str,
-    choices : Sequence[T],
+    choices : Sequence[T] | SearchIndex[T],
     *,
     scorer : Optional[Callable[[str, str], float]] = ...,
     score_cutoff : float = ...,
+    limit : Optional[int] = ...,
+    prefilter : bool = ...,
+    min_candidates : int = ...,
+    shortlist : Optional[Callable[[], Optional[Sequence[int]]]] = ...,
+    explain : Optional[SearchExplain] = ...,
     raw : Literal[True]
 ) -> list[tuple[T, float, int]]:
     ...
@@ -90,10 +312,15 @@ def extract_group(
 def extract_group(
     query : str,
     field : str,
-    choices : Sequence[T],
+    choices : Sequence[T] | SearchIndex[T],
     *,
     scorer : Optional[Callable[[str, str], float]] = ...,
     score_cutoff : float = ...,
+    limit : Optional[int] = ...,
+    prefilter : bool = ...,
+    min_candidates : int = ...,
+    shortlist : Optional[Callable[[], Optional[Sequence[int]]]] = ...,
+    explain : Optional[SearchExplain] = ...,
     raw : Literal[False]
 ) -> list[T]:
     ...
@@ -103,10 +330,15 @@ def extract_group(
 def extract_group(
     query : str,
     field : str,
-    choices : Sequence[T],
+    choices : Sequence[T] | SearchIndex[T],
     *,
     scorer : Optional[Callable[[str, str], float]] = ...,
     score_cutoff : float = ...,
+    limit : Optional[int] = ...,
+    prefilter : bool = ...,
+    min_candidates : int = ...,
+    shortlist : Optional[Callable[[], Optional[Sequence[int]]]] = ...,
+    explain : Optional[SearchExplain] = ...,
     raw : bool = ...
 ) -> list[T]:
     ...
@@ -115,51 +347,248 @@ def extract_group(
 def extract_group(
     query : str,
     field : str,
-    choices : Sequence[T],
+    choices : Sequence[T] | SearchIndex[T],
     *,
     scorer : Optional[Callable[[str, str], float]] = None,
     score_cutoff : float = 60.0,
-    raw : bool = False
+    raw : bool = False,
+    limit : Optional[int] = None,
+    prefilter : bool = False,
+    min_candidates : int = 25,
+    shortlist : Optional[Callable[[], Optional[Sequence[int]]]] = None,
+    explain : Optional[SearchExplain] = None,
 ) -> list[tuple[T, float, int]] | list[T]:
+    """
+    Find distinct field values matching query, best first.
+
+    Args:
+        query: Search query
+        field: Field name to search in
+        choices: Sequence of reference objects, or search index of `field`
+        scorer: Scoring function to use
+        score_cutoff: Twice of minimum score to consider a match
+        raw : returns (value, score, position) if true or returns value
+        limit: Number of best values to return, or every passing value if None
+        prefilter: Scores only values containing query, looked up by n-grams
+        min_candidates: Scores every value if shortlist is smaller than this
+        shortlist: Builds shortlist of `query` on a cache miss, scored instead of looking one up
+        explain: Collects component scores and timings of this search
+    """
     
     basic_cutoff = score_cutoff / 2
     
-    # Get unique field values to search through
-    field_values = _get_field_values(choices, field)
-    
-    if scorer is None:
-        scorer = _oc_scorer
-    
     if field == 'car':
         kw = {'car' : True}
     else:
         kw = None
+
+    index = _as_index(choices, field)
+    if index is None:
+        index = SearchIndex.from_choices(field, choices)
+
+    stage = _no_stage if explain is None else explain.stage
+
+    # only results of default scorer over indexes of a mode are cached
+    cacheable = scorer is None and index.name is not None and explain is None
+    matches = None
+
+    if cacheable:
+        scope, key = (index.name, field), _cache_key(query, basic_cutoff, limit, prefilter, min_candidates)
+        matches = query_cache.get(scope, key, index.version)
+
+    if matches is None:
+        with stage('candidates'):
+            if not prefilter:
+                positions = None
+            elif shortlist is not None:
+                positions = shortlist()
+            else:
+                positions = index.shortlist(query, min_candidates=min_candidates)
+        # (searched, score, index)
+        matches = _extract_indexed(
+            query,
+            index,
+            scorer=scorer,
+            score_cutoff=basic_cutoff,
+            scorer_kwargs=kw,
+            positions=positions,
+            limit=limit,
+            stage=stage
+        )
+        if cacheable:
+            query_cache.put(scope, key, index.version, matches)
+
+    if explain is not None:
+        explained = explain.add_field(field, query, len(index))
+        explained.scored = len(index) if positions is None else len(positions)
+        explained.candidates = _explain_candidates(query, index, matches[:explain.top], basic_cutoff)
+    
+    if raw:
+        return list(matches)
+    return [m[0] for m in matches]
     
-    # Find best matches using rapidfuzz    
-    # (searched, score, index)
-    matches = process.extract(
+
+def _cache_key(
+    query : str,
+    basic_cutoff : float,
+    limit : Optional[int],
+    prefilter : bool,
+    min_candidates : int,
+) -> tuple[Any, ...]:
+    return normalise(query), basic_cutoff, limit, min_candidates if prefilter else None
+
+
+def extract_batch(
+    queries : Sequence[str],
+    field : str,
+    choices : Sequence[T] | SearchIndex[T],
+    *,
+    score_cutoff : float = 60.0,
+    limit : Optional[int] = 5,
+    prefilter : bool = False,
+    min_candidates : int = 25,
+    workers : int = -1,
+) -> list[list[tuple[str, float, int]]]:
+    """
+    Same as `extract_group(query, ..., raw=True)` for each of queries,
+    but scores them as (queries x values) matrices using `workers` threads.
+    Results of named indexes are cached, so it also warms the query cache.
+
+    This blocks for a while with many queries, so run it in a thread from the event loop.
+
+    Args:
+        queries: Search queries
+        field: Field name to search in
+        choices: Sequence of reference objects, or search index of `field`
+        score_cutoff: Twice of minimum score to consider a match
+        limit: Number of best values to return per query, or every passing value if None
+        prefilter: Ranks only values containing each query
+        min_candidates: Ranks every value if shortlist is smaller than this
+        workers: Number of threads scoring, -1 for every CPU core
+
+    Returns:
+        (value, score, position) of matches of each query, in order of `queries`
+    """
+    basic_cutoff = score_cutoff / 2
+
+    index = _as_index(choices, field)
+    if index is None:
+        index = SearchIndex.from_choices(field, choices)
+
+    results : list[Optional[list[tuple[str, float, int]]]] = [None] * len(queries)
+    cacheable = index.name is not None
+    scope = (index.name, field)
+    missed : dict[str, list[int]] = {}
+
+    for i, query in enumerate(queries):
+        key = _cache_key(query, basic_cutoff, limit, prefilter, min_candidates)
+        if cacheable and (cached := query_cache.get(scope, key, index.version)) is not None:
+            results[i] = list(cached)
+        else:
+            # same queries are scored once
+            missed.setdefault(query, []).append(i)
+
+    values = index.values
+    pending = list(missed)
+    step = max(1, batch_cells // max(len(values), 1))
+
+    for start in range(0, len(pending), step):
+        chunk = pending[start:start + step]
+        shortlists = [index.shortlist(query, min_candidates=min_candidates) if prefilter else None for query in chunk]
+
+        # only values shortlisted by some query are scored
+        if any(positions is None for positions in shortlists):
+            columns = None
+        else:
+            columns = sorted(set().union(*shortlists))
+
+        scores = None
+        if values and columns != []:
+            normalised = [normalise(query) for query in chunk]
+            scores = _score_matrix(normalised, index, score_cutoff=basic_cutoff, positions=columns, workers=workers)
+
+        for row, (query, positions) in enumerate(zip(chunk, shortlists)):
+            if scores is None or positions == []:
+                matches = []
+            else:
+                if positions is None:
+                    positions = range(len(values))
+                    selected = scores[row]
+                elif columns is None:
+                    selected = scores[row, positions]
+                else:
+                    selected = scores[row, np.searchsorted(columns, positions)]
+
+                matches = [
+                    (values[positions[i]], float(selected[i]), positions[i])
+                    for i in _rank(selected, basic_cutoff, limit)
+                ]
+
+            if cacheable:
+                query_cache.put(scope, _cache_key(query, basic_cutoff, limit, prefilter, min_candidates), index.version, matches)
+            for i in missed[query]:
+                results[i] = list(matches)
+
+    return results
+
+
+def _match(
+    query : str,
+    field : str,
+    index : SearchIndex[T],
+    *,
+    scorer : Optional[Callable[[str, str], float]],
+    score_cutoff : float,
+    limit : int = 3,
+    explain : Optional[SearchExplain] = None,
+) -> tuple[str, float, tuple[int, ...]]:
+    """Returns best matching value, its score and IDs of rows having it.
+    Up to `limit` best values are extracted, the rest of them are suggested on failure."""
+    if scorer is None:
+        # values picked from autocomplete and enumerated fields match exactly,
+        # and exact value always scores 100, so skip scoring.
+        with _no_stage('candidates') if explain is None else explain.stage('candidates'):
+            position = index.lookup(query)
+
+        if position is not None:
+            found = index.values[position]
+            if explain is not None:
+                explained = explain.add_field(field, query, len(index))
+                explained.exact = True
+                explained.candidates = _explain_candidates(query, index, [(found, 100.0, position)], score_cutoff / 2)
+            return found, 100.0, index.postings[position]
+
+    matches = extract_group(
         query,
-        field_values,
+        field,
+        index,
         scorer=scorer,
-        score_cutoff=basic_cutoff,
-        processor=lambda s: s.lower(),
-        limit=None,
-        scorer_kwargs=kw
+        score_cutoff=score_cutoff,
+        raw=True,
+        limit=limit,
+        explain=explain
     )
     
-    if raw:
-        return matches
-    return [m[0] for m in matches]
-    
+    if not matches:
+        raise RuntimeError(f'Can not found `{field}- {query}`')
+        
+    found, score, _ = matches[0]
+    if score < score_cutoff:
+        suggestion = '\n'.join([f'`{match[0]}`' for match in matches[:limit]])
+        raise RuntimeError(f'Can not found `[{field}] {query}`.\n\nDid you mean...\n{suggestion}')
+
+    return found, score, index.rows(found)
+
 
 @overload
 def find(
     query: str,
     field: str,
-    choices: Sequence[T],
+    choices: Sequence[T] | SearchIndex[T],
     *,
     scorer: Optional[Callable[[str, str], float]] = ...,
     score_cutoff: float = ...,
+    limit: int = ...,
     raw : Literal[True],
 ) -> list[tuple[T, float]]:
     ...
@@ -169,10 +598,11 @@ def find(
 def find(
     query: str,
     field: str,
-    choices: Sequence[T],
+    choices: Sequence[T] | SearchIndex[T],
     *,
     scorer: Optional[Callable[[str, str], float]] = ...,
     score_cutoff: float = ...,
+    limit: int = ...,
     raw : Literal[False],
 ) -> list[T]:
     ...
@@ -182,10 +612,11 @@ def find(
 def find(
     query: str,
     field: str,
-    choices: Sequence[T],
+    choices: Sequence[T] | SearchIndex[T],
     *,
     scorer: Optional[Callable[[str, str], float]] = ...,
     score_cutoff: float = ...,
+    limit: int = ...,
     raw : bool = ...,
 ) -> list[T]:
     ...
@@ -194,10 +625,11 @@ def find(
 def find(
     query: str,
     field: str,
-    choices: Sequence[T],
+    choices: Sequence[T] | SearchIndex[T],
     *,
     scorer: Optional[Callable[[str, str], float]] = None,
     score_cutoff: float = 0.0,
+    limit: int = 3,
     raw : bool = False,
 ) -> list[tuple[T, float]] | list[T]:
     """
@@ -206,9 +638,10 @@ def find(
     Args:
         query: Search query
         field: Field name to search in
-        choices: Sequence of reference objects
+        choices: Sequence of reference objects, or search index of `field`
         scorer: Scoring function to use
         score_cutoff: Minimum score to consider a match
+        limit: Number of best values to extract. The best is used, others are suggested on failure
         raw : returns (best match, score) if true or returns best match
         
     Returns:
@@ -216,34 +649,25 @@ def find(
         or list of matches
     """
     
-    matches = extract_group(query, field, choices, scorer=scorer, score_cutoff=score_cutoff, raw=True)
-    
-    if not matches:
-        raise RuntimeError(f'Can not found `{field}- {query}`')
-        
-    found, score, _ = matches[0]
-    if score < score_cutoff:
-        suggestion = '\n'.join([f'`{match[0]}`' for match in matches[:3]])
-        raise RuntimeError(f'Can not found `[{field}] {query}`.\n\nDid you mean...\n{suggestion}')
+    index = _as_index(choices, field)
+    if index is None:
+        index = SearchIndex.from_choices(field, choices)
+
+    found, score, row_ids = _match(query, field, index, scorer=scorer, score_cutoff=score_cutoff, limit=limit)
     
-    # Find the first choice that matches the best field value
+    # Find the choices that match the best field value
+    source = index.source
+    rows = [source[row] for row in row_ids]
     if raw:
-        return [
-            (choice, score) for choice in choices 
-            if (choice[field] if isinstance(choice, dict) else getattr(choice, field)) == found
-        ]
-    
-    return [
-        choice for choice in choices 
-        if (choice[field] if isinstance(choice, dict) else getattr(choice, field)) == found
-    ]
+        return [(row, score) for row in rows]
+    return rows
 
 
 @overload
 def find_one(
     query: str,
     field: str,
-    choices: Sequence[T],
+    choices: Sequence[T] | SearchIndex[T],
     *,
     scorer: Optional[Callable[[str, str], float]] = ...,
     score_cutoff: float = ...,
@@ -256,7 +680,7 @@ def find_one(
 def find_one(
     query: str,
     field: str,
-    choices: Sequence[T],
+    choices: Sequence[T] | SearchIndex[T],
     *,
     scorer: Optional[Callable[[str, str], float]] = ...,
     score_cutoff: float = ...,
@@ -269,7 +693,7 @@ def find_one(
 def find_one(
     query: str,
     field: str,
-    choices: Sequence[T],
+    choices: Sequence[T] | SearchIndex[T],
     *,
     scorer: Optional[Callable[[str, str], float]] = ...,
     score_cutoff: float = ...,
@@ -281,7 +705,7 @@ def find_one(
 def find_one(
     query: str,
     field: str,
-    choices: Sequence[T],
+    choices: Sequence[T] | SearchIndex[T],
     *,
     scorer: Optional[Callable[[str, str], float]] = None,
     score_cutoff: float = 80.0,
@@ -311,12 +735,34 @@ def find_one(
     return result[0]
 
 
+def _plan(fields : dict[str, Any], choices : Sequence[T]) -> list[tuple[str, SearchIndex[T]]]:
+    """Orders fields of a compound search, most selective first.
+
+    Enumerated fields come first, then fields with less rows per value.
+    Each field after the first is only scored against rows matched so far.
+    """
+    plan = []
+    for field in fields:
+        index = _as_index(choices, field)
+        if index is None:
+            index = SearchIndex.from_choices(field, choices)
+        plan.append((field, index))
+
+    def selectivity(item : tuple[str, SearchIndex[T]]) -> tuple[bool, float]:
+        field, index = item
+        return field not in enumerated_fields, len(index.source) / max(len(index), 1)
+
+    plan.sort(key=selectivity)
+    return plan
+
+
 def search_references(
     fields: dict[str, Any],
-    choices: list[ReferenceInfo],
+    choices: Sequence[ReferenceInfo],
     *,
     scorer: Optional[Callable[[str, str], float]] = None,
     score_cutoff: float = 60.0,
+    explain: Optional[SearchExplain] = None,
 ) -> SearchResult:
     """
     Search through references using multiple fields.
@@ -326,6 +772,7 @@ def search_references(
         choices: Sequence of reference objects
         scorer: Scoring function to use
         score_cutoff: Minimum score to consider a match
+        explain: Collects component scores and timings of this search
         
     Returns:
         Tuple of (best match or None, best score, matched field)
@@ -346,35 +793,61 @@ def search_references(
             raise ValueError(f"Invalid car class: {cls}. Valid classes : {valid_classes}")
         del cls
 
-    search_detail : list[DetailByField] = []
+    cacheable = scorer is None and isinstance(choices, ReferenceStore) and explain is None
+    if cacheable:
+        scope = (choices.name, tuple(fields))
+        key = (tuple(fields.values()), score_cutoff)
+        version = tuple(choices.index(field).version for field in fields)
+
+        if (cached := query_cache.get(scope, key, version)) is not None:
+            return SearchResult(references=list(cached['references']), detail=list(cached['detail']))
+
+    stage = _no_stage if explain is None else explain.stage
+    details : dict[str, DetailByField] = {}
+    rows : Optional[set[int]] = None
+
+    plan = _plan(fields, choices)
+    if explain is not None:
+        explain.plan = [field for field, _ in plan]
     
-    for field, user_search in fields.items():
-        
-        temp : list[tuple[ReferenceInfo, float]] = find(
-            query=user_search,
-            field=field,
-            choices=choices,
+    for field, index in plan:
+        user_search = fields[field]
+        if rows is not None:
+            # only values of rows matched so far can match
+            with stage('rows'):
+                index = index.subset(rows)
+
+        found, score, row_ids = _match(
+            user_search,
+            field,
+            index,
             scorer=scorer,
             score_cutoff=score_cutoff,
-            raw=True,
+            explain=explain,
         )
 
-        reference, score = temp[0]
-        suggestion = asdict(reference)[field]
-        exact = True if score >= 100.0 else False
-
         detail = DetailByField(
             field=field,
             user_search=user_search,
-            suggestion=suggestion,
-            exact=exact
+            suggestion=found,
+            exact=score >= 100.0
         )
-        search_detail.append(detail)
-        
-        choices : list[ReferenceInfo] = [choice for choice, score in temp]
-        
+        details[field] = detail
+
+        with stage('rows'):
+            rows = set(row_ids) if rows is None else rows.intersection(row_ids)
+        if explain is not None:
+            explain.fields[-1].rows = len(rows)
+
+    # details keep order of `fields`
+    search_detail = [details[field] for field in fields]
+    
+    with stage('rows'):
+        references = [choices[row] for row in sorted(rows)] if rows is not None else list(choices)
+    if cacheable:
+        query_cache.put(scope, key, version, SearchResult(references=references, detail=search_detail))
+
     return SearchResult(
-        references=choices,
-        detail=search_detail
+        references=list(references),
+        detail=list(search_detail)
     )
-    
\ No newline at end of file
@@ -1,11 +1,13 @@
 from __future__ import annotations
 from bson import ObjectId
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import (
+    Dict,
     List,
     Literal,
     NamedTuple,
     Optional,
+    Tuple,
     Union
 )
 from pydantic import BaseModel, Field, field_validator
@@ -160,4 +162,22 @@ class CarInfo:
 class ReferenceInfo(CarInfo):
     track : str
     record : str
-    link : str
\ No newline at end of file
+    link : str
+
+
+# mode, car, track, class and occurrence of the same combination in the sheet
+ReferenceKey = Tuple[str, str, str, str, int]
+
+
+@dataclass(frozen=True)
+class ReferenceDiff:
+    mode : str
+    added : Dict[ReferenceKey, ReferenceInfo] = field(default_factory=dict)
+    removed : Dict[ReferenceKey, ReferenceInfo] = field(default_factory=dict)
+    changed : Dict[ReferenceKey, Tuple[ReferenceInfo, ReferenceInfo]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def summary(self) -> str:
+        return f'{self.mode} : +{len(self.added)} -{len(self.removed)} ~{len(self.changed)}'
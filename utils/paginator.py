@@ -1,5 +1,4 @@
 from __future__ import annotations
-from collections import deque, OrderedDict
 from discord import (
     ButtonStyle,
     ComponentType,
@@ -16,11 +15,10 @@ from discord.ext import menus
 from discord.utils import maybe_coroutine
 from typing import Any, List, Optional, Union, TypeVar, Sequence
 from typing_extensions import Self
-from .models import ReferenceInfo
-from .stringformat import one_reference_string
+from .renderCache import ClassGroup, RenderCache
+from .store import ReferenceRow
 
 import inspect
-import itertools
 
 
 
@@ -34,90 +32,99 @@ T = TypeVar('T')
 
 
 
+class _EmbedListSource(menus.ListPageSource):
+    """Embeds built ahead, one per page."""
+    def __init__(self, embeds : Sequence[Embed]):
+        super().__init__(embeds, per_page=1)
+
+    async def format_page(self, menu : T_Pagination, page : Embed) -> Embed:
+        return page
+
+
 class T_Pagination(ui.View):
     """Generate Embed page.
     You can use it with normal or ephemeral message.\n
     Unlike F_Pagination, however, There is no "Exit" Button.
-    
+
+    Give `embeds` built ahead, or `source` whose `format_page` returns an `Embed`.
+    Pages of `source` are built only when shown, and only the shown page gets its footer.
 
     Args:
-        ui (_type_): _description_
+        embeds: Embed of each page.
+        source: Page source building embed of each page.
     """
     def __init__(
         self,
         embeds : List[Embed] = None,
         *,
+        source : Optional[menus.ListPageSource] = None,
         _author : Union[Member, User] = None
     ):
         super().__init__(timeout=120)
         self._author = _author
-        self._embeds = embeds
+        self.source = source if source is not None else _EmbedListSource(embeds or [])
         self._current_page = 1
+        self._len = self.source.get_max_pages()
+        self._initial = embeds[0] if embeds else None
         self.message : Optional[InteractionMessage] = None
-        
-        if embeds:
-            self._queue = deque(embeds)
-            self._len = len(embeds)
-            if self._len == 1:
-                self.clear_items()
-            else:
-                self.first_page.disabled = True
-                self.previous.disabled = True
-            
-            self._initial = embeds[0]
-            self._queue[0].set_footer(text=f'Page : {self._current_page} / {self._len}')
-            
-    async def update_button(self, interaction : Interaction, *, embed : Embed):
-        for i in self._queue:
-            i.set_footer(text=f"Page : {self._current_page} / {self._len} ")   
-        
-        if self._current_page == self._len:
-            self.next.disabled = True
-            self.last_page.disabled = True
-        else:
-            self.next.disabled = False
-            self.last_page.disabled = False
-        
-        if self._current_page == 1:
-            self.first_page.disabled = True
-            self.previous.disabled = True
-        else:
-            self.first_page.disabled = False
-            self.previous.disabled = False
 
+        if self._len <= 1:
+            self.clear_items()
+        else:
+            self._update_buttons()
+
+        if self._initial is not None:
+            self._initial.set_footer(text=self._footer(1))
+
+    def _footer(self, page_number : int) -> str:
+        return f'Page : {page_number} / {self._len}'
+
+    def _update_buttons(self):
+        last = self._current_page == self._len
+        self.next.disabled = last
+        self.last_page.disabled = last
+
+        first = self._current_page == 1
+        self.first_page.disabled = first
+        self.previous.disabled = first
+
+    async def render_page(self, page_number : int) -> Embed:
+        """Builds embed of page `page_number`, counted from 1, with its footer."""
+        page = await self.source.get_page(page_number - 1)
+        embed = await maybe_coroutine(self.source.format_page, self, page)
+        embed.set_footer(text=self._footer(page_number))
+        return embed
+
+    async def show_page(self, interaction : Interaction, page_number : int):
+        self._current_page = min(max(page_number, 1), self._len)
+        self._update_buttons()
+        embed = await self.render_page(self._current_page)
         await interaction.response.edit_message(embed=embed, view=self)
 
+    async def start(self, interaction : Interaction, *, ephemeral : bool = False):
+        """Sends the first page."""
+        embed = await self.render_page(1)
+        if interaction.response.is_done():
+            self.message = await interaction.followup.send(embed=embed, view=self, ephemeral=ephemeral, wait=True)
+        else:
+            await interaction.response.send_message(embed=embed, view=self, ephemeral=ephemeral)
+            self.message = await interaction.original_response()
+
     @ui.button(label="|<", style=ButtonStyle.danger, custom_id="Tfirst")
     async def first_page(self, interaction : Interaction, _):
-        self._queue.rotate(1)
-        embed = self._queue[0]
-        self._current_page = 1
-
-        await self.update_button(interaction, embed=embed)
+        await self.show_page(interaction, 1)
 
     @ui.button(label="<", style=ButtonStyle.primary, custom_id="Tprevious")
     async def previous(self, interaction : Interaction, _):
-        self._queue.rotate(1)
-        embed = self._queue[0]
-        self._current_page -= 1
-        
-        await self.update_button(interaction, embed=embed)
+        await self.show_page(interaction, self._current_page - 1)
 
     @ui.button(label=">", style=ButtonStyle.primary, custom_id="Tnext")
     async def next(self, interaction : Interaction, _):
-        self._queue.rotate(-1)
-        embed = self._queue[0]
-        self._current_page += 1
-        
-        await self.update_button(interaction, embed=embed)
+        await self.show_page(interaction, self._current_page + 1)
 
     @ui.button(label=">|", style=ButtonStyle.danger, custom_id="Tlast")
     async def last_page(self, interaction : Interaction, _):
-        self._queue.rotate(-1)
-        embed = self._queue[0]
-        self._current_page = self._len
-        
-        await self.update_button(interaction, embed=embed)
+        await self.show_page(interaction, self._len)
 
     async def on_timeout(self) -> None:
         if self.message:
@@ -136,7 +143,8 @@ class T_Pagination(ui.View):
         return False
 
     @property
-    def initial(self) -> Embed:
+    def initial(self) -> Optional[Embed]:
+        """First of `embeds`. Pages of `source` are sent with `start`."""
         return self._initial
 
 
@@ -159,11 +167,12 @@ class NumberPageModal(ui.Modal, title='Go to page'):
 class ReferenceSelect(ui.Select['ReferenceSelectPaginator']):
     def __init__(
         self,
-        references: List[ReferenceInfo],
+        render : RenderCache,
         row : int = 0
     ) -> None:
         self.default_message = "Click this to view Reference(s)"
-        self._references = {reference.car : reference for reference in references} 
+        # options are valued by row ID, so records of the same car are told apart
+        self.render = render
         super().__init__(
             placeholder=self.default_message,
             min_values=1,
@@ -171,21 +180,12 @@ class ReferenceSelect(ui.Select['ReferenceSelectPaginator']):
             row=row,
         )
 
-    def adjust_references(self, entries : list[ReferenceInfo]):
-        options = [
-            SelectOption(
-                label=f'[{reference.cls}] {reference.car}',
-                description=reference.record,
-                value=reference.car
-            ) for reference in entries
-        ] 
-        self.options = options
+    def adjust_references(self, options : Sequence[SelectOption]):
+        # prebuilt options are shared, so the select gets its own list
+        self.options = list(options)
           
     def selected_reference_format(self):
-        value = self.values[0]
-        found = self._references[value]
-        
-        return one_reference_string(found)
+        return self.render.message(int(self.values[0]))
     
     async def callback(self, interaction: Interaction) -> None:
         content = self.selected_reference_format()
@@ -429,11 +429,16 @@ class ReferenceSelectPaginator(BasePaginator):
         *,
         author : Union[Member, User],
         check_embeds : bool = True,
-        compact : bool = False
+        compact : bool = False,
+        render : Optional[RenderCache] = None,
+        sources : Optional[dict[str, ReferenceSelectPageSource]] = None,
     ):
         super().__init__(source, author=author, check_embeds=check_embeds, compact=compact)
         self.paging_class = None
         self.buttons = None
+        self.render = render
+        # page source of each class, in order of buttons
+        self.sources = sources or {}
 
         self.other_buttons = [self.numbered_page, self.stop_pages]
         self.paging_buttons = [i for i in self.children if i.type == ComponentType.button and i not in self.other_buttons]
@@ -442,29 +447,23 @@ class ReferenceSelectPaginator(BasePaginator):
     @classmethod
     def from_list(
         cls,
-        iterable : Sequence[ReferenceInfo],
+        iterable : Sequence[ReferenceRow],
         *,
         author : Union[User, Member],
+        per_page : int = 25,
     ) -> Self:
-        return cls(
-            source=ReferenceSelectPageSource(iterable),
-            author=author
-        )
-
-    def _sort(
-        self, per_page : int = 25
-    ):
+        """Pages `iterable` by class, in S, A, B, C, D order. They must be rows of the same store."""
+        render = iterable[0].store.render
         sources = {
-            cls : ReferenceSelectPageSource(list(group), per_page=per_page)
-            for cls, group in itertools.groupby(self.source.entries, key=lambda i: i.cls)
+            group.cls : ReferenceSelectPageSource.from_group(group)
+            for group in render.partition([reference.id for reference in iterable], per_page)
         }
-        priority_order = ['S', 'A', 'B', 'C', 'D']
-        
-        sorted_sources = OrderedDict()
-        for key in priority_order:
-            if key in sources:
-                sorted_sources[key] = sources[key]
-        self.sources = sorted_sources
+        return cls(
+            source=next(iter(sources.values())),
+            author=author,
+            render=render,
+            sources=sources,
+        )
 
     async def _get_kwargs_from_page(self, page: int) -> dict[str, Any]:
         value = await maybe_coroutine(self.source.format_page, self, page)
@@ -480,8 +479,8 @@ class ReferenceSelectPaginator(BasePaginator):
             return {}
 
     async def show_page(self, interaction: Interaction, page_number: int):
-        page, kwargs = await self.adjust_page(page_number)
-        self._select.adjust_references(page)
+        _, kwargs = await self.adjust_page(page_number)
+        self._select.adjust_references(self.source.page_options(page_number))
 
         if kwargs:
             if interaction.response.is_done():
@@ -491,12 +490,10 @@ class ReferenceSelectPaginator(BasePaginator):
                 await interaction.response.edit_message(**kwargs, view=self)
 
     def _prepare_item(self, per_page : int = 25, start_row : int = 0):
-        self._select = select = ReferenceSelect(self.source.entries)
-
-        self._sort(per_page)
+        self._select = select = ReferenceSelect(self.render)
         self.config_class_buttons(1)
 
-        select.adjust_references(self.source.entries)
+        select.adjust_references(self.source.page_options(0))
         self.add_item(select)
 
     def config_class_buttons(self, initial_row : int = 0):
@@ -561,14 +558,27 @@ class ReferenceSelectPaginator(BasePaginator):
 class ReferenceSelectPageSource(menus.ListPageSource):
     def __init__(
         self,
-        entry : Sequence[ReferenceInfo],
+        entry : Sequence[int],
         *,
         per_page : int = 25,
+        options : Sequence[Sequence[SelectOption]] = (),
     ):
-        if not isinstance(entry, list):
+        if not isinstance(entry, (list, tuple)):
             entry = list(entry)
 
         super().__init__(entry, per_page=per_page)
+        self.options = options
+
+    @classmethod
+    def from_group(cls, group : ClassGroup) -> Self:
+        """Pages of `group`. Its pages are already chunked, so this only slices them."""
+        return cls(group.rows, per_page=group.per_page, options=group.options)
+
+    def page_options(self, page_number : int) -> Sequence[SelectOption]:
+        """Returns select options of page `page_number`."""
+        if page_number < len(self.options):
+            return self.options[page_number]
+        return ()
 
-    async def format_page(self, menu : ReferenceSelectPaginator, entries : list[ReferenceInfo]):
+    async def format_page(self, menu : ReferenceSelectPaginator, entries : Sequence[int]):
         return
\ No newline at end of file
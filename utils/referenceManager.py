@@ -1,18 +1,29 @@
 from __future__ import annotations
-from aiohttp import ClientSession
+from collections import deque
 from config import *
+from enum import Enum
 from pathlib import Path
-from typing import Any, List, Optional
-from .models import CarInfo, ReferenceInfo
+from typing import Any, Callable, Generator, Iterable, List, Optional, Sequence
+from .models import CarInfo, ReferenceDiff, ReferenceInfo, ReferenceKey
 from .exception import DownloadFailed
+from .fetcher import SheetFetcher
+from .snapshot import SourceState
 
 import aiofiles
+import asyncio
+import codecs
 import csv
+import hashlib
+import itertools
 import logging
 
 
 __all__ = (
+    "RenewStatus",
+    "CsvStream",
     "CsvDataBaseManager",
+    "diff_references",
+    "key_references",
     "get_references",
     "get_car_list"
 )
@@ -23,6 +34,9 @@ db_folder = current_path.parent.parent / 'data'
 
 log = logging.getLogger(__name__)
 
+# size of chunk read from response body while streaming
+chunk_size = 64 * 1024
+
 
 dbs = [
     ("carhunt", carhunt_db),
@@ -32,6 +46,43 @@ dbs = [
 ]
 
 
+class RenewStatus(Enum):
+    """Result of the latest renewal of one source."""
+    unchanged = 'unchanged'
+    changed = 'changed'
+    failed = 'failed'
+
+
+def key_references(mode : str, references : Iterable[ReferenceInfo]) -> dict[ReferenceKey, ReferenceInfo]:
+    """Keys references by mode, car, track and class.
+    Repeated combinations are told apart by their occurrence."""
+    keyed : dict[ReferenceKey, ReferenceInfo] = {}
+    occurrences : dict[tuple[str, str, str], int] = {}
+
+    for reference in references:
+        base = (reference.car, reference.track, reference.cls)
+        occurrence = occurrences.get(base, 0)
+        occurrences[base] = occurrence + 1
+        keyed[(mode, *base, occurrence)] = reference
+    return keyed
+
+
+def diff_references(
+    mode : str,
+    previous : dict[ReferenceKey, ReferenceInfo],
+    current : dict[ReferenceKey, ReferenceInfo],
+) -> ReferenceDiff:
+    """Compares two keyed snapshots of the same mode."""
+    added = {key : current[key] for key in current.keys() - previous.keys()}
+    removed = {key : previous[key] for key in previous.keys() - current.keys()}
+    changed = {
+        key : (previous[key], current[key])
+        for key in current.keys() & previous.keys()
+        if previous[key] != current[key]
+    }
+    return ReferenceDiff(mode, added, removed, changed)
+
+
 class ManagerBase:
     def __init__(
         self,
@@ -50,34 +101,108 @@ class FileManager(ManagerBase):
     def __init__(
         self,
         url: str,
-        session: Optional[ClientSession] = None,
+        fetcher: SheetFetcher,
     ):
         super().__init__(url)
-        if session is None:
-            self._session_was_none = True
-            self._session = ClientSession()
-        else:
-            self._session_was_none = False
-            self._session = session
-
-    async def _save(self, newline : Optional[str] = None):
+        self._fetcher = fetcher
+
+    async def _save(self, body : bytes):
         raise NotImplementedError
         
     def _resolve_path(self):
         raise NotImplementedError
 
 
+class CsvStream:
+    """Splits incrementally decoded CSV text into rows.
+
+    Lines are handed to `csv.reader` only once a whole record arrived,
+    so quoted fields containing newlines are parsed correctly.
+    """
+    def __init__(self) -> None:
+        self._buffer = ''
+        self._record : list[str] = []
+        self._quotes = 0
+        self._lines : deque[str] = deque()
+        self._reader = csv.reader(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        # Used by csv.reader, not by callers.
+        if not self._lines:
+            raise StopIteration
+        return self._lines.popleft()
+
+    def _push(self, line : str) -> Optional[list[str]]:
+        self._record.append(line)
+        self._quotes += line.count('"')
+        if self._quotes % 2:
+            return None
+
+        self._lines.extend(self._record)
+        self._record.clear()
+        self._quotes = 0
+        return next(self._reader, None)
+
+    def feed(self, text : str) -> Generator[list[str], None, None]:
+        """Yields every row completed by `text`."""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+
+        for line in lines:
+            row = self._push(line + '\n')
+            if row is not None:
+                yield row
+
+    def close(self) -> Generator[list[str], None, None]:
+        """Yields remaining rows."""
+        if self._buffer:
+            row = self._push(self._buffer)
+            self._buffer = ''
+            if row is not None:
+                yield row
+
+        if self._record:
+            self._lines.extend(self._record)
+            self._record.clear()
+            yield from self._reader
+
+
 class CsvDataBaseManager(FileManager):
+    """Downloads a CSV sheet and builds `model` from every row while the body arrives.
+
+    Args:
+        name: Name of the source.
+        url: URL of CSV sheet.
+        fetcher: Shared fetcher used for downloading.
+        snapshot: Whether to write downloaded CSV to `data/<name>_db.csv` in background.
+    """
+    info_headers : dict[str, str] = {}
+    model : type = CarInfo
+
     def __init__(
         self,
         name: str,
         url: str,
-        session: Optional[ClientSession] = None,
+        fetcher: SheetFetcher,
+        *,
+        snapshot: bool = False,
     ) -> None:
-        super().__init__(url, session)
+        super().__init__(url, fetcher)
         self._name = name
         self._count = 0
         self._path = self._resolve_path()
+        self._snapshot = snapshot
+        self._snapshot_task : Optional[asyncio.Task[None]] = None
+        self._status : Optional[RenewStatus] = None
+        # validators of the last successfully applied payload
+        self._etag : Optional[str] = None
+        self._last_modified : Optional[str] = None
+        self._digest : Optional[str] = None
+        # validators and size of downloaded payload, until the caller commits it
+        self._pending : Optional[tuple[Optional[str], Optional[str], str, int]] = None
         
     async def get_list(self) -> Any:
         raise NotImplementedError
@@ -85,46 +210,122 @@ class CsvDataBaseManager(FileManager):
     def _resolve_path(self):
         return db_folder / f'{self._name}_db.csv'
 
-    async def _download(self) -> str:
+    def _conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self._etag is not None:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified is not None:
+            headers['If-Modified-Since'] = self._last_modified
+        return headers
+
+    def _build(self, header : list[str]) -> Callable[[list[str]], Any]:
+        columns = [(self.info_headers[h], header.index(h)) for h in header]
+        model = self.model
+
+        def build(row : list[str]):
+            return model(**{field : row[index] for field, index in columns})
+        return build
+
+    async def _download(self) -> Optional[list[Any]]:
+        """Downloads the sheet and splits it into rows while streaming.
+        Returns None when the payload is the same as the last applied one,
+        without building any `model` of it."""
+        digest = hashlib.sha256()
+        stream = CsvStream()
+        chunks : Optional[list[bytes]] = [] if self._snapshot else None
+        rows : list[list[str]] = []
+
+        def consume(completed : Iterable[list[str]]):
+            rows.extend(row for row in completed if row)
+
         try:
-            async with self._session.get(self._url) as response:
+            async with self._fetcher.request(self._url, headers=self._conditional_headers()) as response:
+                if response.status == 304:
+                    return None
                 response.raise_for_status()
-                return await response.text() 
-        
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')()
+
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    digest.update(chunk)
+                    if chunks is not None:
+                        chunks.append(chunk)
+                    consume(stream.feed(decoder.decode(chunk)))
+
+            consume(stream.feed(decoder.decode(b'', final=True)))
+            consume(stream.close())
+
         except Exception as e:
             raise DownloadFailed(self.name) from e
-        
-        finally:
-            if self._session_was_none:
-                await self._session.close()
-
-    async def _save(self, newline : Optional[str] = None):
-        result = await self._download()
-        f = await aiofiles.open(self._path, "w+", encoding='utf-8', newline=newline)
-        await f.write(result)
-        return f
-    
-    async def _process(self):
-        try:
-            f = await self._save('')
-            await f.seek(0)
-            reader = csv.reader(await f.readlines())
-            await f.close()
-            
-            header = next(reader)
-            data = list(reader)
-            header_indexes = {h : header.index(h) for h in header}
 
-            self._count = len(data)
-            return header, data, header_indexes
-        
+        hexdigest = digest.hexdigest()
+        if hexdigest == self._digest:
+            self._etag, self._last_modified = etag, last_modified
+            return None
+
+        if not rows:
+            raise DownloadFailed(self.name)
+
+        build = self._build(rows[0])
+        items = [build(row) for row in itertools.islice(rows, 1, None)]
+
+        self._pending = (etag, last_modified, hexdigest, len(items))
+        if chunks is not None:
+            self._snapshot_task = asyncio.create_task(self._save(b''.join(chunks)))
+        return items
+
+    @property
+    def pending(self) -> bool:
+        """Whether a downloaded payload waits for `commit` or `discard`."""
+        return self._pending is not None
+
+    def commit(self) -> None:
+        """Marks the payload returned by the last `get_list` as applied.
+        Call it only once its items are published, so a failed renewal is retried next time."""
+        if self._pending is not None:
+            self._etag, self._last_modified, self._digest, self._count = self._pending
+            self._pending = None
+
+    def discard(self) -> None:
+        """Forgets the payload returned by the last `get_list`, so the next renewal downloads it again."""
+        self._pending = None
+
+    def prime(self, state : SourceState) -> None:
+        """Restores validators of a payload applied before restart."""
+        self._etag = state.etag
+        self._last_modified = state.last_modified
+        self._digest = state.digest
+        self._count = len(state.items)
+
+    def state(self, items : Sequence[Any]) -> SourceState:
+        """Returns `items` with validators of the payload they were parsed from."""
+        return SourceState(items, self._digest, self._etag, self._last_modified)
+
+    async def _save(self, body : bytes):
+        try:
+            async with aiofiles.open(self._path, "wb") as f:
+                await f.write(body)
         except Exception as e:
-            raise e
+            log.warning(f"Failed writing {self._name} snapshot due to '{e}'.")
+    
+    async def _process(self) -> Optional[list[Any]]:
+        # a payload never committed is downloaded and compared again
+        self.discard()
+        return await self._download()
         
     @property
     def name(self):
         return self._name
 
+    @property
+    def status(self) -> Optional[RenewStatus]:
+        return self._status
+
+    @property
+    def digest(self) -> Optional[str]:
+        return self._digest
+
     @property
     def count(self):
         return self._count
@@ -137,64 +338,104 @@ class CsvDataBaseManager(FileManager):
 
 
 class ReferenceManager(CsvDataBaseManager):
+    info_headers = {
+        'CAR_NAME': 'car',
+        'AREA': 'track',
+        'LAP_TIME': 'record',
+        'LINK': 'link',
+        'CLASS': 'cls'
+    }
+    model = ReferenceInfo
+
     def __init__(
         self,
         name : str,
         url : str,
-        session: Optional[ClientSession] = None,
+        fetcher : SheetFetcher,
+        *,
+        snapshot : bool = False,
     ) -> None:
-        super().__init__(name, url, session)
+        super().__init__(name, url, fetcher, snapshot=snapshot)
+        self._previous : dict[ReferenceKey, ReferenceInfo] = {}
+        self._pending_previous : Optional[dict[ReferenceKey, ReferenceInfo]] = None
+        self._diff = ReferenceDiff(name)
+
+    def prime(self, state : SourceState) -> None:
+        super().prime(state)
+        self._previous = key_references(self._name, state.items)
+
+    def commit(self) -> None:
+        if self._pending_previous is not None:
+            self._previous = self._pending_previous
+            self._pending_previous = None
+        super().commit()
+
+    def discard(self) -> None:
+        self._pending_previous = None
+        super().discard()
+
+    @property
+    def diff(self) -> ReferenceDiff:
+        """Difference between the last applied snapshot and the one returned by the last `get_list`."""
+        return self._diff
     
     async def get_list(self) -> tuple[str, List[ReferenceInfo]]:
+        """Returns renewed references, pending until `commit` is called.
+        The list is empty when the sheet is unchanged or renewal failed, see `status`."""
         try:
-            headers, data, header_indexes = await self._process()
-            info_headers = {
-                'CAR_NAME': 'car',
-                'AREA': 'track',
-                'LAP_TIME': 'record',
-                'LINK': 'link',
-                'CLASS': 'cls'
-            }
-
-            lists = [
-                ReferenceInfo(**{info_headers[header]: data[i][header_indexes[header]] for header in headers})
-                for i in range(self.count)
-            ]
+            lists = await self._process()
+            if lists is None:
+                self._status = RenewStatus.unchanged
+                self._diff = ReferenceDiff(self._name)
+                log.info(f'{self._name} reference is unchanged.')
+                return self.name, []
             
-            log.info(f'Found "{len(lists)}" {self._name} reference(s).')
+            current = key_references(self._name, lists)
+            self._diff = diff_references(self._name, self._previous, current)
+            self._pending_previous = current
+            self._status = RenewStatus.changed
+            log.info(f'Found "{len(lists)}" {self._name} reference(s). ({self._diff.summary()})')
             return self.name, lists
 
         except Exception as e:
+            self._status = RenewStatus.failed
             log.warning(f"Failed AUTOMATICALLY renew DBs due to '{e}'.", exc_info=e)
             return self.name, []
 
 
 class CarListManager(CsvDataBaseManager):
-    def init(
+    info_headers = {
+        "CLASS" : "cls",
+        "CAR NAME" : "car",
+    }
+    model = CarInfo
+
+    def __init__(
         self,
-        session : ClientSession,
         name : str,
-        url : str
+        url : str,
+        fetcher : SheetFetcher,
+        *,
+        snapshot : bool = False,
     ) -> None:
-        super().__init__(name, url, session)
+        super().__init__(name, url, fetcher, snapshot=snapshot)
 
     async def get_list(self) -> tuple[str, List[CarInfo]]:
+        """Returns renewed car list, pending until `commit` is called.
+        The list is empty when the sheet is unchanged or renewal failed, see `status`."""
         try:
-            headers, data, header_indexes = await self._process()
-
-            info_headers = {
-                "CLASS" : "cls",
-                "CAR NAME" : "car",
-            }
+            lists = await self._process()
+            if lists is None:
+                self._status = RenewStatus.unchanged
+                log.info('Car list is unchanged.')
+                return self.name, []
 
-            lists = [
-                CarInfo(**{info_headers[header] : data[i][header_indexes[header]] for header in headers})
-                for i in range(self._count)
-            ]
+            self._status = RenewStatus.changed
             log.info(f'Found "{len(lists)}" car list(s).')
             return self.name, lists
 
         except Exception as e:
+            self._status = RenewStatus.failed
             log.warning(f"Failed AUTOMATICALLY renew DBs due to '{e}'.", exc_info=e)
             return self.name, []
 
@@ -204,12 +445,12 @@ def _transform_to_spreadsheet_url(id : str) -> str:
     return f"https://docs.google.com/spreadsheets/d/{key}/export?format=csv&id={key}&gid={id}"
 
 
-def get_references() :
+def get_references(fetcher : SheetFetcher, *, snapshot : bool = False) :
     return [
-        ReferenceManager(name, _transform_to_spreadsheet_url(id))
+        ReferenceManager(name, _transform_to_spreadsheet_url(id), fetcher, snapshot=snapshot)
         for name, id in dbs
     ]
 
 
-def get_car_list() :
-    return CarListManager('car_list', car_list_db)
+def get_car_list(fetcher : SheetFetcher, *, snapshot : bool = False) :
+    return CarListManager('car_list', car_list_db, fetcher, snapshot=snapshot)
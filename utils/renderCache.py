@@ -0,0 +1,131 @@
+from __future__ import annotations
+from discord import SelectOption
+from typing import Iterable, Sequence, TYPE_CHECKING
+from .stringformat import one_reference_string, reference_string
+
+if TYPE_CHECKING:
+    from .models import ReferenceInfo
+    from .store import ReferenceRow, ReferenceStore
+
+
+__all__ = (
+    "ClassGroup",
+    "RenderCache",
+    "rendered",
+)
+
+
+# maximum number of options of a select menu
+OPTIONS_PER_PAGE = 25
+
+# order classes are shown in
+CLASS_ORDER = ('S', 'A', 'B', 'C', 'D')
+_class_priority = {cls : priority for priority, cls in enumerate(CLASS_ORDER)}
+
+OptionPages = tuple[tuple[SelectOption, ...], ...]
+
+
+class ClassGroup:
+    """Rows of one class of a result, with their select options chunked into pages.
+
+    Args:
+        cls: Class of the rows.
+        rows: Row IDs, in order of the result.
+        options: Select options of each page.
+        per_page: Rows per page.
+    """
+    __slots__ = ('cls', 'rows', 'options', 'per_page')
+
+    def __init__(self, cls : str, rows : tuple[int, ...], options : OptionPages, per_page : int) -> None:
+        self.cls = cls
+        self.rows = rows
+        self.options = options
+        self.per_page = per_page
+
+    @property
+    def pages(self) -> int:
+        return len(self.options)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __repr__(self) -> str:
+        return f'<ClassGroup cls={self.cls!r} rows={len(self.rows)} pages={self.pages}>'
+
+
+class RenderCache:
+    """Message text and select option of every row of a `ReferenceStore`, built once per snapshot.
+
+    Everything is keyed by row ID, so records of the same car never collide.
+    Groups of each whole class are built ahead, since class-only
+    searches return exactly those rows.
+
+    Args:
+        store: References to render.
+        per_page: Options per page of select menu.
+    """
+    __slots__ = ('per_page', 'messages', 'options', 'classes', '_class_groups')
+
+    def __init__(self, store : ReferenceStore, *, per_page : int = OPTIONS_PER_PAGE) -> None:
+        self.per_page = per_page
+        self.messages : list[str] = []
+        self.options : list[SelectOption] = []
+        # class of each row
+        self.classes : list[str] = []
+
+        columns = zip(*(store.column(field) for field in store.fields))
+        for id, (cls, car, track, record, link) in enumerate(columns):
+            self.messages.append(reference_string(car=car, track=track, record=record, link=link))
+            self.options.append(SelectOption(label=f'[{cls}] {car}', description=record, value=str(id)))
+            self.classes.append(cls)
+
+        index = store.index('cls')
+        self._class_groups = {
+            cls : ClassGroup(cls, rows, self._chunk(rows, per_page), per_page)
+            for cls, rows in zip(index.values, index.postings)
+        }
+
+    def _chunk(self, rows : Sequence[int], per_page : int) -> OptionPages:
+        options = self.options
+        return tuple(
+            tuple(options[id] for id in rows[start:start + per_page])
+            for start in range(0, len(rows), per_page)
+        )
+
+    def message(self, id : int) -> str:
+        return self.messages[id]
+
+    def group(self, cls : str, rows : Sequence[int], per_page : int = OPTIONS_PER_PAGE) -> ClassGroup:
+        """Returns group of `rows`, all of class `cls`.
+        It is the prebuilt one if `rows` are all rows of `cls`, in order."""
+        rows = tuple(rows)
+        if per_page == self.per_page:
+            prebuilt = self._class_groups.get(cls)
+            if prebuilt is not None and prebuilt.rows == rows:
+                return prebuilt
+        return ClassGroup(cls, rows, self._chunk(rows, per_page), per_page)
+
+    def partition(self, rows : Iterable[int], per_page : int = OPTIONS_PER_PAGE) -> list[ClassGroup]:
+        """Splits `rows` by class, keeping their order within each class.
+        Groups are in order of `CLASS_ORDER`, then unknown classes in order of appearance."""
+        grouped : dict[str, list[int]] = {}
+        classes = self.classes
+        for id in rows:
+            try:
+                grouped[classes[id]].append(id)
+            except KeyError:
+                grouped[classes[id]] = [id]
+
+        order = sorted(grouped, key=lambda cls: _class_priority.get(cls, len(CLASS_ORDER)))
+        return [self.group(cls, grouped[cls], per_page) for cls in order]
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+
+def rendered(reference : ReferenceRow | ReferenceInfo) -> str:
+    """Message text of `reference`, from render cache of its store if it has one."""
+    store = getattr(reference, 'store', None)
+    if store is None:
+        return one_reference_string(reference)
+    return store.render.message(reference.id)
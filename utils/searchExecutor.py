@@ -0,0 +1,114 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Literal, NamedTuple, Optional, TypeVar
+from .exception import SearchBusy
+
+import asyncio
+import functools
+import logging
+
+
+__all__ = (
+    "ExecutorStats",
+    "SearchExecutor",
+)
+
+
+T = TypeVar('T')
+
+log = logging.getLogger(__name__)
+
+
+class ExecutorStats(NamedTuple):
+    inline : int
+    threaded : int
+    rejected : int
+    pending : int
+
+    def __str__(self) -> str:
+        return f'inline={self.inline} threaded={self.threaded} rejected={self.rejected} pending={self.pending}'
+
+
+class SearchExecutor:
+    """Runs searches off the event loop in a bounded thread pool.
+
+    rapidfuzz releases the GIL while scoring, so searches in threads
+    do not delay heartbeats and interactions of other shards.
+
+    Args:
+        mode: 'thread' runs searches in the pool, 'inline' runs every search on the event loop.
+        max_workers: Number of threads of the pool.
+        max_pending: Maximum number of searches waiting or running in the pool.
+            More of them are rejected with `SearchBusy`.
+        inline_threshold: Searches over this many values or less run inline,
+            since handing them to a thread costs more than running them.
+    """
+    def __init__(
+        self,
+        *,
+        mode : Literal['thread', 'inline'] = 'thread',
+        max_workers : int = 2,
+        max_pending : int = 32,
+        inline_threshold : int = 2000,
+    ) -> None:
+        if mode not in ('thread', 'inline'):
+            raise ValueError(f"Invalid search executor mode: {mode}. Valid modes are: thread, inline")
+
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.inline_threshold = inline_threshold
+        self._executor : Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._inline = 0
+        self._threaded = 0
+        self._rejected = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='search')
+        return self._executor
+
+    def _release(self, _ : Future) -> None:
+        self._pending -= 1
+
+    async def run(self, func : Callable[..., T], /, *args : Any, size : int = 0, **kwargs : Any) -> T:
+        """Runs `func(*args, **kwargs)` and returns its result.
+
+        Args:
+            size: Number of values `func` searches over, to decide whether it runs inline.
+
+        Raises:
+            SearchBusy: The pool has `max_pending` searches already.
+        """
+        if self.mode == 'inline' or size <= self.inline_threshold:
+            self._inline += 1
+            return func(*args, **kwargs)
+
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise SearchBusy()
+
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(functools.partial(func, *args, **kwargs))
+        self._pending += 1
+        self._threaded += 1
+        # released when the thread finishes, even if the caller stopped waiting.
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, f))
+        return await asyncio.wrap_future(future)
+
+    @property
+    def stats(self) -> ExecutorStats:
+        return ExecutorStats(
+            inline=self._inline,
+            threaded=self._threaded,
+            rejected=self._rejected,
+            pending=self._pending,
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            log.info('Search executor shut down.')
@@ -0,0 +1,274 @@
+from __future__ import annotations
+from array import array
+from typing import Any, Collection, Generic, Iterable, Optional, Sequence, TypeVar
+
+import itertools
+
+
+__all__ = (
+    "CandidateFilter",
+    "SearchIndex",
+    "has_oc_token",
+)
+
+
+T = TypeVar('T')
+
+_versions = itertools.count(1)
+
+
+def normalise(value : str) -> str:
+    return value.lower()
+
+
+def has_oc_token(tokens : Iterable[str]) -> bool:
+    """Whether tokens contain standalone 'oc' token."""
+    return any(token == 'oc' or token == '(oc)' for token in tokens)
+
+
+def strip(value : str) -> str:
+    """Normalised form used for substring matching of autocomplete."""
+    return value.lower().replace(' ', '')
+
+
+def _field_values(choices : Sequence[Any], field : str) -> Iterable[str]:
+    if hasattr(choices, 'column'):
+        return choices.column(field)
+    return (item[field] if isinstance(item, dict) else getattr(item, field) for item in choices)
+
+
+class CandidateFilter:
+    """Shortlists values of `SearchIndex` for a query without scoring all of them.
+
+    Values are matched on their space-stripped, lowercased form. Postings of
+    every 1, 2 and 3 character gram are kept, so a query keeps values having
+    all of its grams (trigrams, or the whole query if it is shorter),
+    then only the ones the query is actually a substring of.
+
+    Args:
+        normalised: Lowercased values of the index.
+    """
+    __slots__ = ('_stripped', '_grams', '_size')
+
+    def __init__(self, normalised : Sequence[str]) -> None:
+        grams : dict[str, list[int]] = {}
+        self._stripped = [value.replace(' ', '') for value in normalised]
+
+        for position, stripped in enumerate(self._stripped):
+            for gram in {stripped[i:i + n] for n in (1, 2, 3) for i in range(len(stripped) - n + 1)}:
+                try:
+                    grams[gram].append(position)
+                except KeyError:
+                    grams[gram] = [position]
+
+        self._grams = {gram : frozenset(positions) for gram, positions in grams.items()}
+        self._size = len(normalised)
+
+    @property
+    def stripped(self) -> list[str]:
+        """Space-stripped, lowercased values, in order of the index."""
+        return self._stripped
+
+    def _by_grams(self, stripped : str) -> set[int]:
+        n = min(len(stripped), 3)
+        grams = {stripped[i:i + n] for i in range(len(stripped) - n + 1)}
+        postings = sorted((self._grams.get(gram, frozenset()) for gram in grams), key=len)
+
+        result = set(postings[0])
+        for positions in postings[1:]:
+            if not result:
+                break
+            result &= positions
+        return result
+
+    def candidates(self, query : str) -> list[int]:
+        """Returns sorted positions of values containing `query`, ignoring case and spaces."""
+        stripped = strip(query)
+        if not stripped:
+            return list(range(self._size))
+
+        found = self._by_grams(stripped)
+        if len(stripped) > 3:
+            values = self._stripped
+            found = [p for p in found if stripped in values[p]]
+        return sorted(found)
+
+    def narrow(self, query : str, positions : Iterable[int]) -> list[int]:
+        """Returns `positions` of values containing `query`, keeping their order.
+        Same as `candidates` if `positions` contains all of them, e.g. candidates of a part of `query`."""
+        stripped = strip(query)
+        values = self._stripped
+        return [p for p in positions if stripped in values[p]]
+
+
+class SearchIndex(Generic[T]):
+    """Search data of one field, built once per snapshot.
+
+    Args:
+        field: Field name the index was built for.
+        source: Choices the index was built from. Row IDs are positions in it.
+        values: Distinct field values in order of first appearance.
+        postings: Row IDs having each value, in the same order as `values`.
+        name: Name of the mode.
+    """
+    __slots__ = (
+        'field',
+        'source',
+        'values',
+        'normalised',
+        'tokens',
+        'oc',
+        'postings',
+        'positions',
+        'name',
+        'version',
+        '_row_positions',
+        '_candidate_filter',
+        '_exact',
+    )
+
+    def __init__(
+        self,
+        field : str,
+        source : Sequence[T],
+        values : list[str],
+        postings : list[tuple[int, ...]],
+        *,
+        name : Optional[str] = None,
+        normalised : Optional[list[str]] = None,
+        tokens : Optional[list[frozenset[str]]] = None,
+        oc : Optional[list[bool]] = None,
+    ) -> None:
+        self.field = field
+        self.source = source
+        self.values = values
+        self.normalised = [normalise(value) for value in values] if normalised is None else normalised
+        self.tokens = [frozenset(value.split()) for value in self.normalised] if tokens is None else tokens
+        self.oc = [has_oc_token(tokens) for tokens in self.tokens] if oc is None else oc
+        self.postings = postings
+        self.positions = {value : position for position, value in enumerate(values)}
+        self.name = name
+        # changes whenever an index is rebuilt, so it can key caches.
+        self.version = next(_versions)
+        self._row_positions : Optional[array] = None
+        self._candidate_filter : Optional[CandidateFilter] = None
+        self._exact : Optional[dict[str, int]] = None
+
+    @classmethod
+    def from_choices(
+        cls,
+        field : str,
+        choices : Sequence[T],
+        *,
+        name : Optional[str] = None,
+    ) -> SearchIndex[T]:
+        postings : dict[str, list[int]] = {}
+        for row, value in enumerate(_field_values(choices, field)):
+            try:
+                postings[value].append(row)
+            except KeyError:
+                postings[value] = [row]
+
+        return cls(
+            field,
+            choices,
+            list(postings),
+            [tuple(rows) for rows in postings.values()],
+            name=name,
+        )
+
+    def rows(self, value : str) -> tuple[int, ...]:
+        """Returns IDs of rows whose field is `value`."""
+        position = self.positions.get(value)
+        if position is None:
+            return ()
+        return self.postings[position]
+
+    def resolve(self, value : str) -> list[T]:
+        """Returns rows whose field is `value`."""
+        source = self.source
+        return [source[row] for row in self.rows(value)]
+
+    def lookup(self, value : str) -> Optional[int]:
+        """Returns position of `value`, compared case-insensitively, without scoring.
+        An exact value wins over ones only equal after normalisation."""
+        position = self.positions.get(value)
+        if position is not None:
+            return position
+
+        if self._exact is None:
+            exact : dict[str, int] = {}
+            for position, normalised in enumerate(self.normalised):
+                exact.setdefault(normalised, position)
+            self._exact = exact
+        return self._exact.get(normalise(value))
+
+    @property
+    def row_positions(self) -> array:
+        """Position of value of each indexed row, built on first use."""
+        if self._row_positions is None:
+            positions = array('I', [0]) * len(self.source)
+            for position, rows in enumerate(self.postings):
+                for row in rows:
+                    positions[row] = position
+            self._row_positions = positions
+        return self._row_positions
+
+    @property
+    def candidate_filter(self) -> CandidateFilter:
+        """N-gram lookup of values, built on first use."""
+        self.build()
+        return self._candidate_filter
+
+    def build(self) -> None:
+        """Builds the n-gram lookup now, instead of on the first shortlist.
+        This blocks, so run it in a thread from the event loop."""
+        if self._candidate_filter is None:
+            self._candidate_filter = CandidateFilter(self.normalised)
+
+    def shortlist(
+        self,
+        query : str,
+        *,
+        min_candidates : int = 25,
+        within : Optional[Sequence[int]] = None,
+    ) -> Optional[list[int]]:
+        """Returns positions of values worth scoring for `query`.
+        Returns None when the shortlist has less than `min_candidates` values,
+        so that every value should be scored instead.
+
+        `within` narrows a previous shortlist of a query which `query` contains,
+        instead of looking up n-grams."""
+        if len(self.values) <= min_candidates:
+            return None
+
+        if within is None:
+            positions = self.candidate_filter.candidates(query)
+        else:
+            positions = self.candidate_filter.narrow(query, within)
+        if len(positions) < min_candidates:
+            return None
+        return positions
+
+    def subset(self, rows : Collection[int]) -> SearchIndex[T]:
+        """Returns index of `rows` only. Values keep their order.
+        It has no name, since it is built per search and should not be cached."""
+        row_positions = self.row_positions
+        kept = sorted({row_positions[row] for row in rows})
+        rows = rows if isinstance(rows, (set, frozenset)) else set(rows)
+
+        return SearchIndex(
+            self.field,
+            self.source,
+            [self.values[p] for p in kept],
+            [tuple(row for row in self.postings[p] if row in rows) for p in kept],
+            normalised=[self.normalised[p] for p in kept],
+            tokens=[self.tokens[p] for p in kept],
+            oc=[self.oc[p] for p in kept],
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return f'<SearchIndex name={self.name!r} field={self.field!r} values={len(self.values)} version={self.version}>'
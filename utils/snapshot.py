@@ -0,0 +1,116 @@
+from __future__ import annotations
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Mapping, NamedTuple, Optional, Sequence
+from .models import CarInfo, ReferenceInfo
+
+import json
+import logging
+import os
+import time
+import zlib
+
+
+__all__ = (
+    "SourceState",
+    "StoredSnapshot",
+    "snapshot_path",
+    "save_snapshot",
+    "load_snapshot",
+)
+
+
+current_path = Path(__file__).resolve()
+snapshot_path = current_path.parent.parent / 'data' / 'reference_snapshot.bin'
+
+log = logging.getLogger(__name__)
+
+# bump this when the layout of stored snapshot changes.
+SNAPSHOT_FORMAT = 2
+
+_models = {model.__name__ : model for model in (CarInfo, ReferenceInfo)}
+
+
+class SourceState(NamedTuple):
+    items : Sequence[Any]
+    digest : Optional[str] = None
+    etag : Optional[str] = None
+    last_modified : Optional[str] = None
+
+
+class StoredSnapshot(NamedTuple):
+    version : int
+    created_at : float
+    sources : dict[str, SourceState]
+
+
+def _encode(state : SourceState) -> dict[str, Any]:
+    model = getattr(state.items, 'model', None) or (type(state.items[0]) if state.items else CarInfo)
+    names = [f.name for f in fields(model)]
+    return {
+        'model' : model.__name__,
+        'fields' : names,
+        'rows' : [[getattr(item, name) for name in names] for item in state.items],
+        'digest' : state.digest,
+        'etag' : state.etag,
+        'last_modified' : state.last_modified,
+    }
+
+
+def _decode(data : dict[str, Any]) -> SourceState:
+    model = _models[data['model']]
+    names = data['fields']
+    return SourceState(
+        items=[model(**dict(zip(names, row))) for row in data['rows']],
+        digest=data['digest'],
+        etag=data['etag'],
+        last_modified=data['last_modified'],
+    )
+
+
+def save_snapshot(
+    sources : Mapping[str, SourceState],
+    *,
+    version : int,
+    path : Path = snapshot_path,
+) -> None:
+    """Writes parsed sources to `path` atomically.
+    This blocks, so run it in a thread from the event loop."""
+    payload = {
+        'format' : SNAPSHOT_FORMAT,
+        'version' : version,
+        'created_at' : time.time(),
+        'sources' : {name : _encode(state) for name, state in sources.items()},
+    }
+    # JSON, so loading a snapshot can never run code
+    data = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    temp = path.with_suffix('.tmp')
+    with open(temp, 'wb') as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def load_snapshot(path : Path = snapshot_path) -> Optional[StoredSnapshot]:
+    """Reads a snapshot written by `save_snapshot`.
+    Returns None if there is none or it can not be used."""
+    try:
+        with open(path, 'rb') as f:
+            payload = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+
+        if payload.get('format') != SNAPSHOT_FORMAT:
+            log.warning('Ignoring reference snapshot of format %s.', payload.get('format'))
+            return None
+
+        return StoredSnapshot(
+            version=payload['version'],
+            created_at=payload['created_at'],
+            sources={name : _decode(data) for name, data in payload['sources'].items()},
+        )
+
+    except FileNotFoundError:
+        return None
+
+    except Exception as e:
+        log.warning(f"Failed loading reference snapshot due to '{e}'.", exc_info=e)
+        return None
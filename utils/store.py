@@ -0,0 +1,286 @@
+from __future__ import annotations
+from array import array
+from types import MappingProxyType
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence, overload
+from .models import CarInfo, ReferenceInfo
+from .renderCache import RenderCache
+from .searchIndex import SearchIndex
+
+import time
+
+
+__all__ = (
+    "StringPool",
+    "ReferenceRow",
+    "ReferenceStore",
+    "ReferenceSnapshot",
+)
+
+
+class StringPool:
+    """Keeps one copy of each string and hands out integer IDs for them."""
+    __slots__ = ('_strings', '_ids')
+
+    def __init__(self) -> None:
+        self._strings : list[str] = []
+        self._ids : dict[str, int] = {}
+
+    def intern(self, value : str) -> int:
+        try:
+            return self._ids[value]
+        except KeyError:
+            id = self._ids[value] = len(self._strings)
+            self._strings.append(value)
+            return id
+
+    def get(self, value : str) -> Optional[int]:
+        """Returns ID of `value` without interning it."""
+        return self._ids.get(value)
+
+    def __getitem__(self, id : int) -> str:
+        return self._strings[id]
+
+    @property
+    def strings(self) -> list[str]:
+        return self._strings
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+class ReferenceRow:
+    """Read-only view of one row of `ReferenceStore`.
+    It has same attributes as `ReferenceInfo`, but holds only a row handle."""
+    __slots__ = ('_store', 'id')
+
+    def __init__(self, store : ReferenceStore, id : int) -> None:
+        self._store = store
+        self.id = id
+
+    @property
+    def store(self) -> ReferenceStore:
+        return self._store
+
+    @property
+    def cls(self) -> str:
+        return self._store.value(self.id, 'cls')
+
+    @property
+    def car(self) -> str:
+        return self._store.value(self.id, 'car')
+
+    @property
+    def track(self) -> str:
+        return self._store.value(self.id, 'track')
+
+    @property
+    def record(self) -> str:
+        return self._store.value(self.id, 'record')
+
+    @property
+    def link(self) -> str:
+        return self._store.value(self.id, 'link')
+
+    def values(self) -> tuple[str, ...]:
+        return tuple(self._store.value(self.id, field) for field in ReferenceStore.fields)
+
+    def materialize(self) -> ReferenceInfo:
+        return ReferenceInfo(**dict(zip(ReferenceStore.fields, self.values())))
+
+    def __eq__(self, other : Any) -> bool:
+        if isinstance(other, ReferenceRow):
+            return self.values() == other.values()
+        if isinstance(other, ReferenceInfo):
+            return self.values() == tuple(getattr(other, field) for field in ReferenceStore.fields)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.values())
+
+    def __repr__(self) -> str:
+        values = ', '.join(f'{field}={value!r}' for field, value in zip(ReferenceStore.fields, self.values()))
+        return f'<ReferenceRow id={self.id} {values}>'
+
+
+class ReferenceStore(Sequence[ReferenceRow]):
+    """Columnar, immutable storage of references of one mode.
+
+    Every field is a column of string IDs in `pool`, so repeated car, track
+    and class names are stored only once, and rows are plain integer handles.
+    Iterating or indexing it returns `ReferenceRow` views, so it can be used
+    wherever a sequence of `ReferenceInfo` is expected.
+
+    Args:
+        name: Name of the mode.
+        pool: Pool which interned strings of columns.
+        columns: String IDs of each field.
+    """
+    fields = ('cls', 'car', 'track', 'record', 'link')
+    model = ReferenceInfo
+    __slots__ = ('name', '_pool', '_columns', '_length', '_unique', '_indexes', '_render')
+
+    def __init__(self, name : str, pool : StringPool, columns : dict[str, array]) -> None:
+        self.name = name
+        self._pool = pool
+        self._columns = columns
+        self._length = len(columns[self.fields[0]])
+        self._unique : dict[str, list[str]] = {}
+        self._indexes : dict[str, SearchIndex[ReferenceRow]] = {}
+        self._render : Optional[RenderCache] = None
+
+    @classmethod
+    def from_references(
+        cls,
+        name : str,
+        references : Iterable[ReferenceInfo],
+        *,
+        pool : Optional[StringPool] = None,
+    ) -> ReferenceStore:
+        pool = pool or StringPool()
+        columns = {field : array('I') for field in cls.fields}
+        appends = [(columns[field].append, field) for field in cls.fields]
+
+        for reference in references:
+            for append, field in appends:
+                append(pool.intern(getattr(reference, field)))
+        return cls(name, pool, columns)
+
+    @property
+    def pool(self) -> StringPool:
+        return self._pool
+
+    def value(self, row : int, field : str) -> str:
+        return self._pool[self._columns[field][row]]
+
+    def ids(self, field : str) -> array:
+        """Returns string IDs of `field` column."""
+        return self._columns[field]
+
+    def column(self, field : str) -> Iterator[str]:
+        return map(self._pool.strings.__getitem__, self._columns[field])
+
+    def unique(self, field : str) -> list[str]:
+        """Returns distinct values of `field` in order of first appearance."""
+        try:
+            return self._unique[field]
+        except KeyError:
+            values = self._unique[field] = list(map(self._pool.strings.__getitem__, dict.fromkeys(self._columns[field])))
+            return values
+
+    def index(self, field : str) -> SearchIndex[ReferenceRow]:
+        """Returns search index of `field`, building it on first use."""
+        try:
+            return self._indexes[field]
+        except KeyError:
+            index = self._indexes[field] = SearchIndex.from_choices(field, self, name=self.name)
+            return index
+
+    @property
+    def render(self) -> RenderCache:
+        """Rendered messages and select options of rows, built on first use."""
+        self.prepare()
+        return self._render
+
+    def prepare(self) -> None:
+        """Renders every row now, instead of on the first result.
+        This blocks, so run it in a thread from the event loop."""
+        if self._render is None:
+            self._render = RenderCache(self)
+
+    def materialize(self) -> list[ReferenceInfo]:
+        return [row.materialize() for row in self]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by columns, excluding strings."""
+        return sum(column.itemsize * len(column) for column in self._columns.values())
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index : int) -> ReferenceRow:
+        ...
+
+    @overload
+    def __getitem__(self, index : slice) -> list[ReferenceRow]:
+        ...
+
+    def __getitem__(self, index : int | slice) -> ReferenceRow | list[ReferenceRow]:
+        if isinstance(index, slice):
+            return [ReferenceRow(self, row) for row in range(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('reference row out of range')
+        return ReferenceRow(self, index)
+
+    def __iter__(self) -> Iterator[ReferenceRow]:
+        return (ReferenceRow(self, row) for row in range(self._length))
+
+    def __repr__(self) -> str:
+        return f'<ReferenceStore name={self.name!r} rows={self._length}>'
+
+
+class ReferenceSnapshot:
+    """Immutable references of every mode and the car list, of one version.
+
+    Renewals build a new snapshot with `replace` and publish it by assigning it once,
+    so a reader holding a snapshot sees the same data across modes until it is done.
+    Nothing of it is copied for readers.
+
+    Args:
+        version: Version of the snapshot, increased by each `replace`.
+        references: Reference store of each mode.
+        car_list: Cars of the car list.
+    """
+    __slots__ = ('version', 'references', 'car_list', 'created_at')
+
+    def __init__(
+        self,
+        version : int,
+        references : Mapping[str, ReferenceStore],
+        car_list : Sequence[CarInfo] = (),
+        *,
+        created_at : Optional[float] = None,
+    ) -> None:
+        self.version = version
+        self.references : Mapping[str, ReferenceStore] = MappingProxyType(dict(references))
+        self.car_list : tuple[CarInfo, ...] = tuple(car_list)
+        self.created_at = time.time() if created_at is None else created_at
+
+    @classmethod
+    def empty(cls) -> ReferenceSnapshot:
+        return cls(0, {})
+
+    def replace(
+        self,
+        *,
+        references : Optional[Mapping[str, ReferenceStore]] = None,
+        car_list : Optional[Sequence[CarInfo]] = None,
+        version : Optional[int] = None,
+    ) -> ReferenceSnapshot:
+        """Returns next version with `references` of some modes and/or `car_list` replaced."""
+        merged = dict(self.references)
+        if references:
+            merged.update(references)
+
+        return ReferenceSnapshot(
+            self.version + 1 if version is None else version,
+            merged,
+            self.car_list if car_list is None else car_list,
+        )
+
+    def get(self, name : str) -> Optional[ReferenceStore]:
+        return self.references.get(name)
+
+    def __getitem__(self, name : str) -> ReferenceStore:
+        return self.references[name]
+
+    def __contains__(self, name : str) -> bool:
+        return name in self.references
+
+    def __repr__(self) -> str:
+        modes = ', '.join(f'{name}={len(references)}' for name, references in self.references.items())
+        return f'<ReferenceSnapshot version={self.version} {modes} cars={len(self.car_list)}>'
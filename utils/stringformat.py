@@ -4,16 +4,24 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .models import ReferenceInfo
 
-import inspect
+
+_reference_format = (
+    "```\n"
+    "Car    : {car}\n"
+    "Track  : {track}\n"
+    "Record : {record}\n"
+    "```{link}"
+)
+
+
+def reference_string(*, car : str, track : str, record : str, link : str) -> str:
+    return _reference_format.format(car=car, track=track, record=record, link=link)
 
 
 def one_reference_string(reference: ReferenceInfo) -> str:
-    return inspect.cleandoc(
-        f"""
-        ```
-        Car    : {reference.car}
-        Track  : {reference.track}
-        Record : {reference.record}
-        ```{reference.link}
-        """
-    )
\ No newline at end of file
+    return reference_string(
+        car=reference.car,
+        track=reference.track,
+        record=reference.record,
+        link=reference.link,
+    )